@@ -1,7 +1,13 @@
 import socket
 from select import select
 
-to_monitor = []
+from framing import read_requests
+
+to_monitor = []  # сокеты, которые ждут чтения
+to_write = []  # сокеты, у которых есть неотправленные данные
+buffers = {}  # {client_socket: bytearray}  # исходящий буфер каждого подключения
+HIGH_WATER = 64 * 1024  # перестаем читать клиента, который не успевает забирать ответы
+incoming = {}  # {client_socket: (bytearray, int)}  # буфер с недочитанным запросом и его длина
 
 server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # (IP4, TCP)
 server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # переиспользование порта
@@ -13,32 +19,83 @@ def accept_connection(server_socket):
     client_socket, addr = server_socket.accept()  # ждем входящего подключения (блокирующая операция)
     print('Connection from', addr)  # Connection from ('127.0.0.1', 62619)
 
+    client_socket.setblocking(False)  # send отправит сколько сможет, а не будет ждать
+    buffers[client_socket] = bytearray()
     to_monitor.append(client_socket)
 
 
 # низкая связность между блокирующими функциями
 
 def send_message(client_socket):
-    request = client_socket.recv(4 * 1024)  # ждет сообщение от клиента
+    response = read_requests(client_socket, incoming)
+
+    if response is None:
+        close_connection(client_socket)
+    elif response:
+        buffers[client_socket] += response  # не отправляем сразу, а копим в буфере
+        flush(client_socket)
+
+
+def flush(client_socket):
+    buffer = buffers[client_socket]
+    sent = 0
+
+    with memoryview(buffer) as view:  # срезы memoryview не копируют данные
+        try:
+            while sent < len(view):
+                sent += client_socket.send(view[sent:])  # может отправить только часть
+        except BlockingIOError:  # буфер сокета в ядре заполнен
+            pass
+        except ConnectionError:
+            sent = -1
+
+    if sent == -1:
+        close_connection(client_socket)
+        return
+
+    del buffer[:sent]
+    update_monitoring(client_socket)
 
-    if request:
-        response = 'Hello world!\n'.encode()
-        client_socket.send(response)
-    else:
+
+def update_monitoring(client_socket):
+    buffer = buffers[client_socket]
+    reading = client_socket in to_monitor
+    writing = client_socket in to_write
+
+    if buffer and not writing:  # ждем write только пока есть что отправить
+        to_write.append(client_socket)
+    elif not buffer and writing:
+        to_write.remove(client_socket)
+
+    if len(buffer) >= HIGH_WATER and reading:  # backpressure
         to_monitor.remove(client_socket)
-        client_socket.close()
+    elif len(buffer) < HIGH_WATER and not reading:
+        to_monitor.append(client_socket)
+
+
+def close_connection(client_socket):
+    for sockets in to_monitor, to_write:
+        if client_socket in sockets:
+            sockets.remove(client_socket)
+    del buffers[client_socket]
+    incoming.pop(client_socket, None)
+    client_socket.close()
 
 
 def event_loop():
     to_monitor.append(server_socket)
 
     while True:
-        ready_to_read, _, _ = select(to_monitor, [], [])  # доступны для read, write, errors
+        ready_to_read, ready_to_write, _ = select(to_monitor, to_write, [])  # доступны для read, write, errors
+
+        for sock in ready_to_write:
+            if sock in buffers:  # мог закрыться в этой же итерации
+                flush(sock)
 
         for sock in ready_to_read:
             if sock is server_socket:
                 accept_connection(sock)
-            else:
+            elif sock in buffers:
                 send_message(sock)
 
 
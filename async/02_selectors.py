@@ -1,13 +1,27 @@
+import argparse
+import os
 import selectors  # надстройка над select
+import signal
 import socket
+import time
+import traceback
+
+from framing import read_requests
 
 selector = selectors.DefaultSelector()
 # Linux – Epoll / Mac OS – Kqueue
 
+buffers = {}  # {client_socket: bytearray}  # исходящий буфер каждого подключения
+HIGH_WATER = 64 * 1024  # перестаем читать клиента, который не успевает забирать ответы
+incoming = {}  # {client_socket: (bytearray, int)}  # буфер с недочитанным запросом и его длина
+
 
-def server():
+def server(reuse_port=False):
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        # несколько процессов слушают один порт, ядро само распределяет между ними подключения
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     server_socket.bind(('localhost', 5000))
     server_socket.listen()
 
@@ -18,26 +32,69 @@ def server():
     )
 
 
-def accept_connection(server_socket):
+def accept_connection(server_socket, mask):
     client_socket, addr = server_socket.accept()
-    print('Connection from', addr)
+    print('Connection from', addr, 'pid', os.getpid())
 
+    client_socket.setblocking(False)  # send отправит сколько сможет, а не будет ждать
+    buffers[client_socket] = bytearray()
     selector.register(
         fileobj=client_socket,
         events=selectors.EVENT_READ,
-        data=send_message
+        data=handle_client
     )
 
 
+def handle_client(client_socket, mask):
+    if mask & selectors.EVENT_WRITE:
+        flush(client_socket)
+    if mask & selectors.EVENT_READ and client_socket in buffers:  # мог закрыться при отправке
+        send_message(client_socket)
+
+
 def send_message(client_socket):
-    request = client_socket.recv(4 * 1024)
+    response = read_requests(client_socket, incoming)
 
-    if request:
-        response = 'Hello world!\n'.encode()
-        client_socket.send(response)
-    else:
-        selector.unregister(fileobj=client_socket)
-        client_socket.close()
+    if response is None:
+        close_connection(client_socket)
+    elif response:
+        buffers[client_socket] += response  # не отправляем сразу, а копим в буфере
+        flush(client_socket)
+
+
+def flush(client_socket):
+    buffer = buffers[client_socket]
+    sent = 0
+
+    with memoryview(buffer) as view:  # срезы memoryview не копируют данные
+        try:
+            while sent < len(view):
+                sent += client_socket.send(view[sent:])  # может отправить только часть
+        except BlockingIOError:  # буфер сокета в ядре заполнен
+            pass
+        except ConnectionError:
+            sent = -1
+
+    if sent == -1:
+        close_connection(client_socket)
+        return
+
+    del buffer[:sent]
+
+    events = 0
+    if len(buffer) < HIGH_WATER:  # backpressure: иначе не читаем новые запросы
+        events |= selectors.EVENT_READ
+    if buffer:  # ждем write только пока есть что отправить
+        events |= selectors.EVENT_WRITE
+    if selector.get_key(client_socket).events != events:
+        selector.modify(client_socket, events, data=handle_client)
+
+
+def close_connection(client_socket):
+    selector.unregister(fileobj=client_socket)
+    del buffers[client_socket]
+    incoming.pop(client_socket, None)
+    client_socket.close()
 
 
 def event_loop():
@@ -45,11 +102,66 @@ def event_loop():
         events = selector.select()  # [(key, event), ...]  # events - битовая маска события
         # key: SelectorKey  # namedtuple, который связывает сокет, ожидаемое событие и данные
 
-        for key, _ in events:  # _ – event
+        for key, mask in events:  # mask – EVENT_READ | EVENT_WRITE
             callback = key.data
-            callback(key.fileobj)
+            callback(key.fileobj, mask)
 
 
-if __name__ == '__main__':
-    server()
+# pre-fork: каждый процесс – отдельный событийный цикл на своем ядре
+
+def worker():
+    global selector
+    selector = selectors.DefaultSelector()  # epoll родителя не наследуем
+    server(reuse_port=True)
     event_loop()
+
+
+def spawn_worker():
+    pid = os.fork()
+    if pid == 0:  # дочерний процесс
+        code = 0
+        try:
+            worker()
+        except KeyboardInterrupt:
+            pass
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        os._exit(code)  # не возвращаемся в цикл супервизора
+    print('Worker started, pid', pid)
+    return pid
+
+
+def supervisor(workers):
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # kill – как Ctrl+C
+    pids = {spawn_worker() for _ in range(workers)}
+
+    try:
+        while True:
+            pid, status = os.wait()  # ждем завершения любого воркера
+            pids.discard(pid)
+            print(f'Worker {pid} died (status {status}), restarting')
+            time.sleep(0.5)  # чтобы падающий на старте воркер не перезапускался в бесконечном цикле
+            pids.add(spawn_worker())
+    except KeyboardInterrupt:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-w', '--workers', type=int, default=1,
+        help='число процессов (os.cpu_count() = %s)' % os.cpu_count()
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        supervisor(args.workers)  # python 02_selectors.py -w 4  # только Linux (SO_REUSEPORT + fork)
+    else:
+        server()
+        event_loop()
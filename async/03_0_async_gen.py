@@ -1,5 +1,7 @@
 from collections import deque
-from time import sleep
+from heapq import heappop, heappush
+from itertools import count
+from time import monotonic, sleep
 
 
 def print_nums():
@@ -7,7 +9,7 @@ def print_nums():
     while True:
         print(num)
         num += 1
-        yield
+        yield 0.2  # сколько секунд задача готова подождать
 
 
 def print_time():
@@ -16,19 +18,25 @@ def print_time():
         if count % 3 == 0:
             print(f'{count} seconds have passed')
         count += 1
-        yield
+        yield 1
 
 
 def main():
     g1 = print_nums()
     g2 = print_time()
-    queue = deque([g1, g2])
+    queue = deque([g1, g2])  # готовые к выполнению
+    sleeping = []  # куча [(deadline, n, <generator>), ...]
+    sequence = count()  # n – чтобы при равных дедлайнах не сравнивать генераторы
 
     while True:
-        g = queue.popleft()
-        next(g)
+        while queue:
+            g = queue.popleft()
+            delay = next(g)
+            heappush(sleeping, (monotonic() + delay, next(sequence), g))
+
+        deadline, _, g = heappop(sleeping)
+        sleep(max(0, deadline - monotonic()))  # спим только до ближайшего дедлайна, когда ждут все задачи
         queue.append(g)
-        sleep(0.2)
 
 
 if __name__ == '__main__':
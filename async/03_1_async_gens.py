@@ -1,6 +1,11 @@
 import socket
 from collections import deque
+from heapq import heappop, heappush
+from itertools import count
 from select import select
+from time import monotonic
+
+from framing import get_buffer, parse_requests, release_buffer
 
 # David Beazley
 # 2015 PyCon
@@ -10,6 +15,8 @@ from select import select
 tasks = deque([])  # [<generator>, ...]
 to_read = {}  # {server_socket: <generator>, ...}
 to_write = {}
+sleeping = []  # куча [(deadline, n, <generator>), ...]  # сверху – ближайший дедлайн
+sequence = count()  # n – чтобы при равных дедлайнах не сравнивать генераторы
 
 
 def server():
@@ -23,32 +30,77 @@ def server():
         client_socket, addr = server_socket.accept()
 
         print('Connection from', addr)
+        client_socket.setblocking(False)  # send отправит сколько сможет, а не остановит весь цикл
         tasks.append(client(client_socket))
 
 
 def client(client_socket):
+    buffer, filled = None, 0
+
     while True:
         yield 'read', client_socket
-        request = client_socket.recv(4 * 1024)
+        if buffer is None:
+            buffer = get_buffer()
 
-        if not request:
+        try:
+            with memoryview(buffer) as view:
+                n = client_socket.recv_into(view[filled:])  # пишет прямо в буфер, без нового bytes
+        except BlockingIOError:  # данных пока нет – ждем read снова
+            continue
+        except ConnectionError:
+            n = 0
+
+        if not n:
             break
-        else:
-            response = 'Hello world!\n'.encode()
 
-            yield 'write', client_socket
-            client_socket.send(response)
+        response, filled = parse_requests(buffer, filled + n)
+        if filled == len(buffer):  # запрос не поместился в буфер
+            break
+        if not filled:
+            release_buffer(buffer)  # между запросами соединение не держит буфер
+            buffer = None
+
+        if not (yield from send_all(client_socket, response)):  # клиент отключился
+            break
 
+    if buffer is not None:
+        release_buffer(buffer)
     client_socket.close()
 
 
+def send_all(client_socket, data):
+    # yield from send_all(...) – True, когда все отправлено, False – соединение разорвано
+    with memoryview(data) as view:
+        sent = 0
+        while sent < len(view):
+            yield 'write', client_socket
+            try:
+                sent += client_socket.send(view[sent:])  # может отправить только часть
+            except BlockingIOError:  # буфер сокета в ядре заполнен
+                pass
+            except ConnectionError:
+                return False
+    return True
+
+
+def stats(interval=10):
+    while True:
+        yield 'sleep', interval  # не блокирует остальные задачи, в отличие от time.sleep
+        print('Open connections:', len(to_read) + len(to_write) - 1)  # без серверного сокета
+
+
 def event_loop():
     tasks.append(server())  # [<generator>, ...]
+    tasks.append(stats())
 
-    while any([tasks, to_read, to_write]):
+    while any([tasks, to_read, to_write, sleeping]):
 
         while not tasks:
-            ready_to_read, ready_to_write, _ = select(to_read, to_write, [])  # переберет ключи, т. е. сокеты
+            timeout = None  # без таймеров select ждет сокеты сколько угодно
+            if sleeping:
+                timeout = max(0, sleeping[0][0] - monotonic())  # проснуться к ближайшему дедлайну
+
+            ready_to_read, ready_to_write, _ = select(to_read, to_write, [], timeout)  # переберет ключи, т. е. сокеты
 
             for sock in ready_to_read:
                 tasks.append(to_read.pop(sock))  # <generator>
@@ -56,14 +108,23 @@ def event_loop():
             for sock in ready_to_write:
                 tasks.append(to_write.pop(sock))
 
+            now = monotonic()
+            while sleeping and sleeping[0][0] <= now:
+                _, _, task = heappop(sleeping)
+                tasks.append(task)
+
         try:
             task = tasks.popleft()
-            reason, sock = next(task)
+            reason, arg = next(task)  # arg – сокет, секунды или дедлайн
 
             if reason == 'read':
-                to_read[sock] = task
+                to_read[arg] = task
             elif reason == 'write':
-                to_write[sock] = task
+                to_write[arg] = task
+            elif reason == 'sleep':  # yield 'sleep', 0.5
+                heappush(sleeping, (monotonic() + arg, next(sequence), task))
+            elif reason == 'until':  # yield 'until', monotonic() + 0.5
+                heappush(sleeping, (arg, next(sequence), task))
         except StopIteration:
             print('Done!')
 
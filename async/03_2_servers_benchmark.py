@@ -0,0 +1,225 @@
+"""
+Нагрузочный бенчмарк самописных серверов 01_select.py, 02_selectors.py, 03_1_async_gens.py
+и asyncio.Protocol (06_1_protocol_server.py) для сравнения
+
+python 03_2_servers_benchmark.py -c 100 1000 10000 -d 10 -o benchmark.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+from array import array
+from pathlib import Path
+from threading import BrokenBarrierError
+
+HOST, PORT = 'localhost', 5000
+REQUEST = b'ping\n'  # серверы отвечают на каждую строку
+CONNECT_LIMIT = 200  # одновременных connect, чтобы не переполнить backlog сервера
+PERCENTILES = {'p50': 0.5, 'p99': 0.99, 'p999': 0.999}
+HERE = Path(__file__).parent
+
+SERVERS = {
+    'select': [HERE / '01_select.py'],
+    'selectors': [HERE / '02_selectors.py'],
+    'async_gens': [HERE / '03_1_async_gens.py'],
+    'asyncio': [HERE / '06_1_protocol_server.py'],
+    'uvloop': [HERE / '06_1_protocol_server.py', '--uvloop'],
+}
+
+
+# генератор нагрузки: замкнутый цикл запрос → ответ на каждом подключении
+
+async def connect(limit: asyncio.Semaphore):
+    async with limit:
+        return await asyncio.open_connection(HOST, PORT)
+
+
+async def run_connection(reader, writer, deadline, latencies):
+    try:
+        while (start := time.perf_counter()) < deadline:
+            writer.write(REQUEST)
+            await reader.readuntil(b'\n')
+            latencies.append(time.perf_counter() - start)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        return 1
+    finally:
+        writer.close()
+    return 0
+
+
+async def load(connections, duration, barrier):
+    limit = asyncio.Semaphore(CONNECT_LIMIT)
+    opened = await asyncio.gather(
+        *(connect(limit) for _ in range(connections)),
+        return_exceptions=True
+    )
+    streams = [s for s in opened if not isinstance(s, BaseException)]
+    errors = len(opened) - len(streams)
+
+    try:
+        await asyncio.to_thread(barrier.wait, 60)  # все процессы начинают замер одновременно
+    except BrokenBarrierError:
+        pass
+
+    latencies = array('d')  # компактнее списка float при пересылке между процессами
+    deadline = time.perf_counter() + duration
+    results = await asyncio.gather(*(
+        run_connection(reader, writer, deadline, latencies) for reader, writer in streams
+    ))
+    return latencies, errors + sum(results)
+
+
+def load_process(connections, duration, barrier, queue):
+    queue.put(asyncio.run(load(connections, duration, barrier)))
+
+
+# замер
+
+def wait_port(timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, PORT)).close()
+            return
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+    raise TimeoutError(f'server is not listening on {PORT}')
+
+
+def cpu_seconds(pid):
+    # utime + stime из /proc (Linux), None – если недоступно
+    try:
+        stat = Path(f'/proc/{pid}/stat').read_text()
+    except OSError:
+        return None
+    fields = stat.rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def bench(name, connections, duration, processes):
+    server = subprocess.Popen(
+        [sys.executable, *map(str, SERVERS[name])],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=HERE
+    )
+    queue = multiprocessing.Queue()
+    barrier = multiprocessing.Barrier(processes + 1)
+    clients = []
+
+    try:
+        wait_port()
+        for i in range(processes):
+            share = connections // processes + (i < connections % processes)
+            client = multiprocessing.Process(target=load_process, args=(share, duration, barrier, queue))
+            client.start()
+            clients.append(client)
+
+        barrier.wait(60)
+        cpu_start, wall_start = cpu_seconds(server.pid), time.perf_counter()
+        time.sleep(duration)
+        cpu_end, wall = cpu_seconds(server.pid), time.perf_counter() - wall_start
+
+        latencies, errors = array('d'), 0
+        for _ in clients:
+            part, part_errors = queue.get(timeout=60)
+            latencies.extend(part)
+            errors += part_errors
+        for client in clients:
+            client.join()
+    finally:
+        for client in clients:
+            if client.is_alive():
+                client.terminate()
+        pid, status, usage = os.wait4(server.pid, os.WNOHANG)
+        crashed = pid != 0  # например, select не умеет fd >= 1024
+        if not crashed:
+            server.terminate()
+            _, status, usage = os.wait4(server.pid, 0)  # rusage – только через wait4
+        server.returncode = os.waitstatus_to_exitcode(status)
+
+    latencies = sorted(latencies)
+    cpu = None
+    if cpu_start is not None and cpu_end is not None:
+        cpu = round(100 * (cpu_end - cpu_start) / wall, 1)
+
+    return {
+        'server': name,
+        'connections': connections,
+        'requests': len(latencies),
+        'errors': errors,
+        'server_crashed': crashed,
+        'rps': round(len(latencies) / duration),
+        'latency_ms': {
+            key: None if (value := percentile(latencies, q)) is None else round(value * 1000, 3)
+            for key, q in PERCENTILES.items()
+        },
+        'cpu_percent': cpu,
+        'max_rss_kb': usage.ru_maxrss,  # Linux – килобайты, macOS – байты
+    }
+
+
+def raise_fd_limit():
+    # каждое подключение – дескриптор и у клиента, и у сервера
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def default_servers():
+    servers = list(SERVERS)
+    if importlib.util.find_spec('uvloop') is None:
+        servers.remove('uvloop')
+    return servers
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-c', '--connections', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('-d', '--duration', type=float, default=10, help='секунд на каждый замер')
+    parser.add_argument('-s', '--servers', nargs='+', choices=SERVERS, default=default_servers())
+    parser.add_argument('-p', '--processes', type=int, default=max(1, os.cpu_count() // 2),
+                        help='процессов генератора нагрузки')
+    parser.add_argument('-o', '--output', default='benchmark.json')
+    args = parser.parse_args()
+
+    fd_limit = raise_fd_limit()
+    results = []
+    for connections in args.connections:
+        for name in args.servers:
+            result = bench(name, connections, args.duration, args.processes)
+            results.append(result)
+            print(
+                f"{name:>10} {connections:>6} conn: {result['rps']:>8} req/s  "
+                f"p50 {result['latency_ms']['p50']} ms  p99 {result['latency_ms']['p99']} ms  "
+                f"p999 {result['latency_ms']['p999']} ms  cpu {result['cpu_percent']}%  "
+                f"rss {result['max_rss_kb']} KB  errors {result['errors']}"
+            )
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'fd_limit': fd_limit,
+        'duration': args.duration,
+        'results': results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
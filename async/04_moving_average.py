@@ -1,3 +1,8 @@
+from collections import deque
+
+import numpy as np
+
+
 # декоратор, чтобы не писать при старте g.send(None)
 def init_gen(func):
     def inner(*args, **kwargs):
@@ -23,11 +28,84 @@ def moving_average():  # скользящее среднее
         else:
             count += 1
             summ += x
-            average = round(summ / count, 2)
+            average = summ / count  # без round: округлять только при выводе
 
     return average
 
 
+# ring buffer: deque(maxlen=size) сам вытесняет старое значение, сумма окна обновляется за O(1)
+@init_gen
+def window_average(size):  # скользящее среднее по последним size значениям
+    window = deque(maxlen=size)
+    summ = 0.0
+    average = None
+
+    while True:
+        x = yield average
+
+        if isinstance(x, np.ndarray) and not len(x):  # пустая пачка – окно не меняется
+            average = np.empty(0)
+        elif isinstance(x, np.ndarray):  # пачка значений – один вызов вместо len(x) send
+            average = _window_averages(window, x.astype(float), size)
+            window.extend(x[-size:].tolist())
+            summ = sum(window)  # заодно сбрасываем накопленную ошибку округления
+        else:
+            if len(window) == size:
+                summ -= window[0]
+            window.append(x)
+            summ += x
+            average = summ / len(window)
+
+
+def _window_averages(window, x, size):
+    values = np.concatenate((np.fromiter(window, float, len(window)), x))
+    offset = values.mean()  # центрируем, чтобы длинная cumsum не теряла точность
+    sums = np.concatenate(([0.0], np.cumsum(values - offset)))  # sums[j] – сумма первых j значений
+    end = np.arange(len(window) + 1, len(values) + 1)
+    start = np.maximum(0, end - size)
+    return (sums[end] - sums[start]) / (end - start) + offset
+
+
+# экспоненциальное скользящее среднее: average += alpha * (x - average)
+@init_gen
+def ewma(alpha):
+    last = None  # текущее среднее
+    average = None  # ответ на send: число или вектор для пачки
+
+    while True:
+        x = yield average
+
+        if isinstance(x, np.ndarray) and not len(x):  # пустая пачка – состояние не меняется
+            average = np.empty(0)
+        elif isinstance(x, np.ndarray):
+            average = _ewma_batch(x.astype(float), alpha, x[0] if last is None else last)
+            last = average[-1]
+        elif last is None:
+            average = last = x
+        else:
+            average = last = last + alpha * (x - last)
+
+
+def _ewma_batch(x, alpha, average):
+    # average[i] = beta^(i+1) * average + alpha * beta^i * sum(x[k] / beta^k), beta = 1 - alpha
+    beta = 1 - alpha
+    if beta == 0:
+        return x.copy()
+
+    # блоками, чтобы beta^-k не превышало 1e100; при alpha около 0 блок огромный – не больше самой пачки
+    block = min(len(x), max(1, int(100 / -np.log10(beta))))
+    powers = beta ** np.arange(block)
+    result = np.empty(len(x))
+
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        p = powers[:len(chunk)]
+        result[start:start + block] = p * (beta * average + alpha * np.cumsum(chunk / p))
+        average = result[start + len(chunk) - 1]
+
+    return result
+
+
 g = moving_average()
 print(g.send(25))  # 25.0
 print(g.send(1))  # 13.0
@@ -35,3 +113,11 @@ try:
     g.throw(StopIteration)  # Done!
 except StopIteration as e:
     print('Average: ', e.value)  # Average 13.0
+
+w = window_average(3)
+print(w.send(1), w.send(2), w.send(3), w.send(4))  # 1.0 1.5 2.0 3.0
+print(w.send(np.array([5, 6, 7])))  # [4. 5. 6.]
+
+e = ewma(0.5)
+print(e.send(10), e.send(20))  # 10 15.0
+print(e.send(np.array([30, 40])))  # [22.5  31.25]
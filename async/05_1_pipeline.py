@@ -0,0 +1,150 @@
+"""
+Push-конвейер на корутинах-генераторах: source → mapper / filterer / window → broadcast → sink
+
+Данные проталкиваются через send(), а не вытягиваются через next(), поэтому один источник
+может кормить несколько веток (fan-out), а память не зависит от объема потока.
+Между этапами всегда передается пачка (list): batch=1 – по одному элементу,
+batch=1000 – одно возобновление генератора на тысячу элементов.
+"""
+
+from itertools import islice
+from time import perf_counter
+
+
+def init_gen(func):
+    def inner(*args, **kwargs):
+        g = func(*args, **kwargs)
+        g.send(None)
+        return g
+
+    return inner
+
+
+def source(iterable, target, batch=1):
+    it = iter(iterable)
+    while chunk := list(islice(it, batch)):
+        target.send(chunk)
+    target.close()  # GeneratorExit пройдет по всему конвейеру
+
+
+@init_gen
+def mapper(func, target):
+    try:
+        while True:
+            chunk = yield
+            target.send([func(x) for x in chunk])
+    finally:
+        target.close()
+
+
+@init_gen
+def filterer(predicate, target):
+    try:
+        while True:
+            chunk = yield
+            chunk = [x for x in chunk if predicate(x)]
+            if chunk:
+                target.send(chunk)
+    finally:
+        target.close()
+
+
+@init_gen
+def window(size, target, partial=False):  # непересекающиеся окна по size элементов
+    buffer = []
+    try:
+        while True:
+            buffer.extend((yield))
+            if len(buffer) >= size:
+                end = len(buffer) - len(buffer) % size
+                target.send([buffer[i:i + size] for i in range(0, end, size)])
+                del buffer[:end]
+    except GeneratorExit:
+        if partial and buffer:  # при закрытии отдаем неполное окно
+            target.send([buffer])
+    finally:
+        target.close()
+
+
+@init_gen
+def rebatch(size, target):  # переупаковать поток в пачки по size
+    buffer = []
+    try:
+        while True:
+            buffer.extend((yield))
+            while len(buffer) >= size:
+                target.send(buffer[:size])
+                del buffer[:size]
+    except GeneratorExit:
+        if buffer:
+            target.send(buffer)
+    finally:
+        target.close()
+
+
+@init_gen
+def broadcast(*targets):  # fan-out: одна пачка – во все ветки
+    try:
+        while True:
+            chunk = yield
+            for target in targets:
+                target.send(chunk)
+    finally:
+        for target in targets:
+            target.close()
+
+
+@init_gen
+def sink(func):
+    while True:
+        for x in (yield):
+            func(x)
+
+
+@init_gen
+def collect(result: list):
+    while True:
+        result.extend((yield))
+
+
+# то же самое на обычных генераторах (pull)
+
+def gen_window(iterable, size):
+    it = iter(iterable)
+    while len(chunk := list(islice(it, size))) == size:
+        yield chunk
+
+
+def benchmark(n=1_000_000):
+    data = range(n)
+    double = lambda x: x * 2
+    not_div_by_3 = lambda x: x % 3
+
+    t0 = perf_counter()
+    total = sum(map(sum, gen_window(filter(not_div_by_3, map(double, data)), 10)))
+    print(f'generators        {perf_counter() - t0:.3f}s  {total}')
+
+    for batch in (1, 100, 10_000):
+        result = []
+        t0 = perf_counter()
+        source(data, mapper(double, filterer(not_div_by_3, window(10, mapper(sum, collect(result))))), batch)
+        print(f'push batch={batch:<6} {perf_counter() - t0:.3f}s  {sum(result)}')
+
+
+if __name__ == '__main__':
+    evens = []
+    source(
+        range(10),
+        broadcast(
+            filterer(lambda x: x % 2 == 0, collect(evens)),
+            mapper(lambda x: x * x, window(3, sink(print), partial=True)),
+        ),
+        batch=4
+    )
+    # [0, 1, 4]
+    # [9, 16, 25]
+    # [36, 49, 64]
+    # [81]
+    print(evens)  # [0, 2, 4, 6, 8]
+
+    benchmark()
@@ -0,0 +1,66 @@
+"""
+Сервер 'Hello world!' на asyncio.Protocol и транспортах – совместим с 01_select.py / 02_selectors.py
+
+python 06_1_protocol_server.py
+python 06_1_protocol_server.py --uvloop  # python -m pip install uvloop
+"""
+
+import argparse
+import asyncio
+
+from framing import BUFFER_SIZE, parse_requests
+
+HIGH_WATER = 64 * 1024  # перестаем читать клиента, который не успевает забирать ответы
+
+
+# Protocol – колбэки событийного цикла, Transport – сокет с буфером записи внутри цикла
+# в отличие от streams (reader/writer) здесь нет корутины и Future на каждое чтение
+# (BufferedProtocol с буферами из пула на стандартном цикле медленнее: чтение в него идет через Python)
+
+class HelloProtocol(asyncio.Protocol):
+    def connection_made(self, transport):
+        self.transport = transport
+        self.buffer = bytearray()  # недочитанный запрос
+        transport.set_write_buffer_limits(high=HIGH_WATER)
+        print('Connection from', transport.get_extra_info('peername'))
+
+    def data_received(self, data):
+        self.buffer += data
+        response, rest = parse_requests(self.buffer, len(self.buffer))  # тот же разбор, что в 01/02
+        del self.buffer[rest:]  # недочитанный запрос уже перенесен в начало
+
+        if response:
+            self.transport.write(response)  # ответы на все запросы – одной записью
+        if len(self.buffer) >= BUFFER_SIZE:  # запрос длиннее буфера – как в 01/02
+            self.transport.close()
+
+    # backpressure: транспорт сам зовет эти методы при переполнении и опустошении буфера записи
+    def pause_writing(self):
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+
+async def main():
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(HelloProtocol, 'localhost', 5000, reuse_address=True)
+
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uvloop', action='store_true', help='событийный цикл на libuv')
+    args = parser.parse_args()
+
+    if args.uvloop:
+        try:
+            import uvloop
+        except ImportError:
+            print('uvloop is not installed, using the default event loop')
+        else:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    asyncio.run(main())
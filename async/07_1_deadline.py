@@ -0,0 +1,128 @@
+"""
+Область с дедлайном вместо asyncio.wait_for на каждый вызов
+
+wait_for на каждый вызов создает обертку и отдельный таймер.
+deadline() – один абсолютный дедлайн и один таймер на всю область:
+вложенные области и вызовы внутри нее не создают новых таймеров, если внешний дедлайн наступит раньше.
+"""
+
+import asyncio
+import tracemalloc
+from contextvars import ContextVar
+from time import perf_counter
+
+current_deadline = ContextVar('current_deadline', default=None)  # (when, task)
+
+
+class deadline:
+    __slots__ = ('delay', 'when', '_timeout', '_token')
+
+    def __init__(self, delay=None):  # delay=None – только унаследовать внешний дедлайн
+        self.delay = delay
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        when = None if self.delay is None else loop.time() + self.delay
+        outer = current_deadline.get()
+
+        if outer is not None:
+            outer_when, outer_task = outer
+            if outer_task is task and (when is None or outer_when <= when):
+                # внешний дедлайн этой же задачи наступит раньше – его таймер отменит и нас
+                self.when, self._timeout = outer_when, None
+                return self
+            if when is None or outer_when < when:
+                when = outer_when  # новая задача наследует дедлайн, но таймер ей нужен свой
+
+        if when is None:  # ни своего, ни внешнего дедлайна – ограничивать нечего, в current_deadline не пишем
+            self.when, self._timeout = None, None
+            return self
+
+        self.when = when
+        self._timeout = asyncio.timeout_at(when)  # один call_at на область
+        await self._timeout.__aenter__()
+        self._token = current_deadline.set((when, task))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._timeout is None:
+            return None
+        current_deadline.reset(self._token)
+        return await self._timeout.__aexit__(exc_type, exc, tb)  # CancelledError → TimeoutError
+
+    def remaining(self):  # для API, которым нужен timeout в секундах
+        if self.when is None:
+            return None
+        return max(0.0, self.when - asyncio.get_running_loop().time())
+
+
+async def func(t):
+    await asyncio.sleep(t)
+    return t
+
+
+async def fast_call():
+    await asyncio.sleep(0)
+
+
+async def child():
+    async with deadline() as scope:  # задача, созданная внутри области, унаследует дедлайн
+        print(f'child remaining {scope.remaining():.1f}s')
+        await func(60)
+
+
+async def demo():
+    try:
+        async with deadline(2):
+            await func(0.5)  # успевает
+            async with deadline(10):  # внешний дедлайн раньше – нового таймера нет
+                await asyncio.gather(func(60), asyncio.create_task(child()))
+    except TimeoutError:
+        print('deadline exceeded')
+
+    # shield: по дедлайну отменяется ожидание, но не сама задача
+    long_task = asyncio.create_task(func(1))
+    try:
+        async with deadline(0.5):
+            await asyncio.shield(long_task)
+    except TimeoutError:
+        print('long_task continuate')
+        print(await long_task)
+
+
+async def benchmark(n=100_000):
+    async def wait_for_each():
+        for _ in range(n):
+            await asyncio.wait_for(fast_call(), timeout=5)
+
+    async def deadline_each():
+        for _ in range(n):
+            async with deadline(5):
+                await fast_call()
+
+    async def deadline_once():
+        async with deadline(5):
+            for _ in range(n):
+                async with deadline(5):  # вложенная область без таймера
+                    await fast_call()
+
+    for coro in wait_for_each, deadline_each, deadline_once:
+        t0 = perf_counter()
+        await coro()
+        elapsed = perf_counter() - t0
+
+        tracemalloc.start()  # отдельным проходом: tracemalloc сильно замедляет код
+        await coro()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{coro.__name__:<14} {n / elapsed:>9.0f} calls/s  peak {peak / 1024:.1f} KiB')
+
+
+async def main():
+    await demo()
+    await benchmark()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,39 +1,143 @@
+import argparse
 import asyncio
+from itertools import repeat
 from pathlib import Path
+from random import Random, randrange
 from time import time
 from urllib.parse import urlparse
 
 import aiohttp
+from aiohttp import web
 
+from http_cache import HTTPCache
 
-def write_image(content, url):
+CHUNK_SIZE = 64 * 1024
+
+
+def image_path(url):
     filename = Path(urlparse(url).path).name
-    folder = Path('./pictures')
-    folder.mkdir(exist_ok=True)
-    with open(folder.joinpath(filename), 'wb') as file:
-        file.write(content)
+    return Path('./pictures').joinpath(filename)
+
+
+def open_image(url):
+    path = image_path(url)
+    path.parent.mkdir(exist_ok=True)
+    return open(path, 'wb')
 
 
-async def fetch_image(url, session: aiohttp.ClientSession):
+async def fetch_image(url, session: aiohttp.ClientSession, cache: HTTPCache = None):
     # response = requests.get(url, allow_redirects=True)
+    if cache is not None:  # одинаковые картинки скачиваются и хранятся один раз
+        response = await cache.fetch(session, url)
+        if not response.ok:
+            raise aiohttp.ClientError(f'{response.url} returned {response.status}')
+        await response.save(image_path(str(response.url)))
+        return 0 if response.from_cache else response.size
+
+    loop = asyncio.get_running_loop()
+    size = 0
+
     async with session.get(url, allow_redirects=True) as response:
-        result = await response.read()
-        write_image(result, str(response.url))
+        response.raise_for_status()
+        # файловые операции блокируют поток – выполняем их в пуле потоков, а не в событийном цикле
+        file = await loop.run_in_executor(None, open_image, str(response.url))
+        try:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):  # тело не читается в память целиком
+                await loop.run_in_executor(None, file.write, chunk)
+                size += len(chunk)
+        finally:
+            await loop.run_in_executor(None, file.close)
 
+    return size
 
-async def main():
-    url = 'https://loremflickr.com/320/240'
-    tasks = []
 
-    async with aiohttp.ClientSession() as session:
-        for _ in range(10):
-            task = asyncio.create_task(fetch_image(url, session))
-            tasks.append(task)
+async def worker(urls, session, cache, stats):
+    for url in urls:  # общий итератор: задача берет следующий url, когда освободится
+        try:
+            size = await fetch_image(url, session, cache)  # не += await: stats['bytes'] прочиталось бы до await
+            stats['bytes'] += size
+            stats['images'] += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            stats['errors'] += 1
+            print(f'{url}: {e!r}')
 
-        await asyncio.gather(*tasks)
 
+async def download(url, count, concurrency=100, per_host=20, cache=None):
+    connector = aiohttp.TCPConnector(
+        limit=concurrency,  # размер пула соединений
+        limit_per_host=per_host,
+        ttl_dns_cache=300,  # не резолвить хост на каждый запрос
+        keepalive_timeout=30,  # соединения переиспользуются между запросами
+    )
+    timeout = aiohttp.ClientTimeout(total=60)
+    urls = repeat(url, count)
+    stats = {'images': 0, 'bytes': 0, 'errors': 0}
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # concurrency задач вместо count: память не растет с числом картинок
+        workers = [worker(urls, session, cache, stats) for _ in range(min(concurrency, count))]
+        await asyncio.gather(*workers)
+
+    return stats
+
+
+# локальная замена loremflickr для проверки: редирект на одну из STUB_IMAGES картинок (как и там, с повторами)
+
+STUB_IMAGES = 500
+
+
+async def random_image(request: web.Request):
+    raise web.HTTPFound(f'/cache/{randrange(STUB_IMAGES)}.jpg')
+
+
+async def image_body(request: web.Request):
+    name = request.match_info['name']
+    etag = f'"{name}"'
+    if request.headers.get('If-None-Match') == etag:
+        return web.Response(status=304, headers={'ETag': etag})
+    body = Random(name).randbytes(20 * 1024)  # одна и та же картинка для одного имени
+    return web.Response(body=body, content_type='image/jpeg', headers={'ETag': etag})
+
+
+async def start_stub_server(port=8080):
+    app = web.Application()
+    app.router.add_get('/{width}/{height}', random_image)
+    app.router.add_get('/cache/{name}', image_body)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, 'localhost', port).start()
+    return runner, f'http://localhost:{port}/320/240'
+
+
+async def main(args):
+    url, runner = args.url, None
+    if args.local:
+        runner, url = await start_stub_server()
+
+    cache = HTTPCache(args.cache) if args.cache else None
 
-if __name__ == '__main__':
     t0 = time()
-    asyncio.run(main())
-    print(time() - t0)
+    stats = await download(url, args.count, args.concurrency, args.per_host, cache)
+    elapsed = time() - t0
+
+    if runner is not None:
+        await runner.cleanup()
+    if cache is not None:
+        print(cache.stats())
+        cache.close()
+
+    print(
+        f"{stats['images']} images, {stats['errors']} errors, {stats['bytes'] / 1024 / 1024:.1f} MiB "
+        f"in {elapsed:.2f}s: {stats['bytes'] / elapsed / 1024 / 1024:.2f} MiB/s"
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='https://loremflickr.com/320/240')
+    parser.add_argument('-n', '--count', type=int, default=10)
+    parser.add_argument('-c', '--concurrency', type=int, default=100, help='одновременных загрузок')
+    parser.add_argument('--per-host', type=int, default=20, help='соединений на один хост')
+    parser.add_argument('--cache', metavar='DIR', help='кэш ответов на диске, например .http_cache')
+    parser.add_argument('--local', action='store_true', help='качать с локального сервера-заглушки')
+    asyncio.run(main(parser.parse_args()))
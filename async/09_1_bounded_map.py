@@ -0,0 +1,120 @@
+"""
+map поверх TaskGroup с ограничением конкурентности и выдачей результатов по готовности
+
+gather и TaskGroup запускают все задачи сразу и отдают результаты только в конце.
+bounded_map берет элементы из (в том числе бесконечного) итератора лениво, держит не больше limit
+задач в работе и отдает результаты по мере готовности.
+ordered=True – в порядке входа, в буфере перестановки не больше buffer результатов.
+Ошибка в любой задаче отменяет остальные, как в TaskGroup.
+Задача, отмененная сама по себе (не из-за ошибки соседней), пропускается – остальные результаты выдаются.
+"""
+
+import asyncio
+import tracemalloc
+from collections import deque
+from contextlib import aclosing
+from random import random
+
+from aiter_tools import aiter_any
+
+
+async def bounded_map(fn, iterable, limit=100, ordered=False, buffer=None):
+    buffer = buffer or 2 * limit  # ordered: запущенные + готовые, но еще не отданные
+    loop = asyncio.get_running_loop()
+    items = aiter_any(iterable)
+    index_of = {}  # {task: номер элемента}  # запущенные и еще не разобранные задачи
+    done = deque()  # завершенные задачи в порядке завершения
+    finished = {}  # {номер: task}  # буфер перестановки для ordered
+    wakeup = None
+    running = launched = next_index = 0
+    exhausted = failed = False
+
+    def on_done(task):  # колбэк вместо asyncio.wait: не перебирает все limit задач на каждое завершение
+        nonlocal failed
+        if not task.cancelled() and task.exception() is not None:
+            failed = True  # TaskGroup уже отменяет остальные – новые задачи он не примет
+        done.append(task)
+        if wakeup is not None and not wakeup.done():
+            wakeup.set_result(None)
+
+    async with asyncio.TaskGroup() as tg:
+        try:
+            while True:
+                while not exhausted and not failed and running < limit and (not ordered or launched - next_index < buffer):
+                    try:
+                        item = await anext(items)  # следующий элемент берем, только когда есть место
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    task = tg.create_task(fn(item))
+                    task.add_done_callback(on_done)
+                    index_of[task] = launched
+                    running += 1
+                    launched += 1
+
+                if not running and not done:
+                    break
+                if not done:
+                    wakeup = loop.create_future()
+                    await wakeup
+
+                while done:
+                    task = done.popleft()
+                    running -= 1
+                    index = index_of.pop(task)
+                    if not task.cancelled() and task.exception() is not None:
+                        return  # TaskGroup на выходе отменит остальные задачи и выбросит ExceptionGroup
+                    if ordered:
+                        finished[index] = task
+                    elif not task.cancelled():  # отмененная задача (не из-за ошибки) просто не дает результата
+                        yield task.result()
+
+                while next_index in finished:
+                    task = finished.pop(next_index)
+                    next_index += 1
+                    if not task.cancelled():
+                        yield task.result()
+        except GeneratorExit:  # потребитель вышел из async for раньше времени (break)
+            for task in index_of:
+                task.cancel()
+            return
+
+
+async def fetch(n):
+    await asyncio.sleep(random() / 100)
+    return n
+
+
+async def coro_error(n):
+    await asyncio.sleep(0.01)
+    if n == 5:
+        raise ValueError(n)
+    return n
+
+
+async def main():
+    # результаты по готовности и в порядке входа
+    print([n async for n in bounded_map(fetch, range(10), limit=3)])  # [1, 0, 2, 4, 3, ...]
+    print([n async for n in bounded_map(fetch, range(10), limit=3, ordered=True)])  # [0, 1, 2, ...]
+
+    # aclosing: при break или ошибке в теле цикла задачи отменяются сразу, а не при сборке мусора
+    try:
+        async with aclosing(bounded_map(coro_error, range(100), limit=10)) as results:
+            async for n in results:
+                pass
+    except* ValueError as e:
+        print(f'{e=}')  # остальные задачи отменены
+
+    # память не зависит от числа элементов
+    for n in 10_000, 100_000:
+        tracemalloc.start()
+        count = 0
+        async for _ in bounded_map(fetch, range(n), limit=1000, ordered=True):
+            count += 1
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{count:>7} items  peak {peak / 1024 / 1024:.1f} MiB')  # ~2 MiB в обоих случаях
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,35 +1,85 @@
 import asyncio
+import sys
+from itertools import islice
+from time import perf_counter
 
 from redis import asyncio as aioredis
 
 
 class RedisReader:
-    def __init__(self, redis, keys):
+    # ключи читаются пачками через MGET (один запрос на batch_size ключей),
+    # следующая пачка запрашивается, пока async for разбирает текущую
+    def __init__(self, redis, keys, batch_size=100):
         self.redis = redis
         self.keys = keys
+        self.batch_size = batch_size
 
     def __aiter__(self):
         self.ikeys = iter(self.keys)
+        self.batch = iter(())
+        self.next_batch = self._prefetch()
         return self
 
+    def _prefetch(self):
+        keys = list(islice(self.ikeys, self.batch_size))
+        if not keys:
+            return None
+        return asyncio.create_task(self.redis.mget(keys))
+
     async def __anext__(self):
         try:
-            key = next(self.ikeys)
+            name = next(self.batch)
         except StopIteration:
-            raise StopAsyncIteration
-        else:
-            async with self.redis.client() as con:
-                name = await con.get(key)
-            return name.decode('utf-8')
+            if self.next_batch is None:
+                raise StopAsyncIteration
+            values = await self.next_batch
+            self.next_batch = self._prefetch()
+            self.batch = iter(values)
+            name = next(self.batch)
+
+        return None if name is None else name.decode('utf-8')
+
+    async def aclose(self):  # если вышли из цикла раньше – не оставлять висящий запрос
+        if self.next_batch is not None:
+            self.next_batch.cancel()
+
+
+async def read_one_by_one(redis, keys):  # как было: GET на каждый ключ
+    for key in keys:
+        async with redis.client() as con:
+            name = await con.get(key)
+        yield name.decode('utf-8')
+
+
+async def benchmark(redis, n=10_000):
+    keys = [f'user:{i}' for i in range(n)]
+    await redis.mset({key: f'name {i}' for i, key in enumerate(keys)})
+
+    t0 = perf_counter()
+    names = [name async for name in read_one_by_one(redis, keys)]
+    print(f'GET   {n} keys: {perf_counter() - t0:.3f}s')
+
+    t0 = perf_counter()
+    assert names == [name async for name in RedisReader(redis, keys, batch_size=500)]
+    print(f'MGET  {n} keys: {perf_counter() - t0:.3f}s')
+
+    await redis.delete(*keys)
 
 
 async def main():
-    redis = await aioredis.from_url('redis://localhost')
+    if '--fake' in sys.argv:  # без redis-server: python 10_async_for.py --fake
+        from fakeredis import aioredis as fake
+        redis = fake.FakeRedis()
+    else:
+        redis = await aioredis.from_url('redis://localhost')
 
     keys = ['manuilov', 'ivanov', 'petrov']
+    await redis.msetnx({key: key.capitalize() for key in keys})  # если ключей еще нет
 
     async for name in RedisReader(redis, keys):
         print(name)
 
+    await benchmark(redis)
+
 
 asyncio.run(main())
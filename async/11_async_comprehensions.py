@@ -1,17 +1,32 @@
 import asyncio
+from contextlib import aclosing
+from time import perf_counter
 
 from faker import Faker
 
+from aiter_tools import abatch_with_timeout, achunk, amap, amerge, prefetch
+
 faker = Faker('en_US')
 
 # асихронный генератор
 async def get_user(n=1):
     await asyncio.sleep(1)
     for i in range(n):
-        name, surname = faker.name_male().split()
+        name, surname = faker.first_name_male(), faker.last_name()  # name_male() бывает с префиксом: Dr. ...
         yield name, surname
 
 
+async def get_user_slowly(n, delay=0.01):  # как сетевой источник: каждый элемент приходит с задержкой
+    for i in range(n):
+        await asyncio.sleep(delay)
+        yield faker.name_male()
+
+
+async def save_user(name, delay=0.01):  # как запись в базу
+    await asyncio.sleep(delay)
+    return name
+
+
 async def main():
     l = [name async for name in get_user(3)]
     print(l)
@@ -19,6 +34,33 @@ async def main():
     d = {name: surname async for name, surname in get_user(3)}
     print(d)
 
+    print([chunk async for chunk in achunk(get_user(5), 2)])  # [[..., ...], [..., ...], [...]]
+
+    # источник и потребитель по 1 с на 100 элементов: по очереди ~2 с, с prefetch – ~1 с
+    t0 = perf_counter()
+    async for name in get_user_slowly(100):
+        await save_user(name)
+    print(f'sequential {perf_counter() - t0:.2f}s')
+
+    t0 = perf_counter()
+    async for name in prefetch(get_user_slowly(100), depth=10):
+        await save_user(name)
+    print(f'prefetch   {perf_counter() - t0:.2f}s')
+
+    # 20 вызовов save_user одновременно: ~0.05 с вместо 1 с
+    t0 = perf_counter()
+    names = [name async for name in amap(save_user, [faker.name_male() for _ in range(100)], concurrency=20)]
+    print(f'amap       {perf_counter() - t0:.2f}s  {len(names)} users')
+
+    # три источника параллельно: ~0.3 с вместо 0.9 с
+    t0 = perf_counter()
+    names = [name async for name in amerge(*(get_user_slowly(30) for _ in range(3)))]
+    print(f'amerge     {perf_counter() - t0:.2f}s  {len(names)} users')
+
+    # пачки по 8 или каждые 0.05 с: медленный источник не задерживает запись на время полной пачки
+    async with aclosing(abatch_with_timeout(get_user_slowly(10, delay=0.02), 8, 0.05)) as batches:
+        print([len(batch) async for batch in batches])  # [3, 3, 3, 1]
+
 
 if __name__ == '__main__':
     asyncio.run(main())
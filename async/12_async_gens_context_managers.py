@@ -1,7 +1,12 @@
 import asyncio
+import sys
+from collections import OrderedDict
 from contextlib import contextmanager, asynccontextmanager
+from time import monotonic, perf_counter
+from uuid import uuid4
 
 from redis import asyncio as aioredis
+from redis.exceptions import ResponseError
 
 
 @contextmanager
@@ -17,19 +22,252 @@ def custom_open(filename, mode='w'):
 #     file.write('hello world')
 
 
+class CachedRedis:
+    # GET через локальный LRU-кэш с TTL, остальные команды – напрямую в redis
+    # об изменении ключей сервер сообщает сам: CLIENT TRACKING (redis 6+),
+    # иначе keyspace notifications; если не доступно ни то ни другое – кэш выключается
+    # notify-keyspace-events – общая настройка сервера: меняется, только если configure_keyspace=True,
+    # и возвращается обратно в aclose()
+    def __init__(self, pool: aioredis.ConnectionPool, maxsize=10_000, ttl=60, configure_keyspace=False):
+        self.pool = pool
+        self.redis = aioredis.Redis(connection_pool=pool)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache = OrderedDict()  # {key: (value, expires)}
+        self.pending = {}  # {key: token}  # GET в полете: инвалидация во время запроса отменяет запись в кэш
+        self.mode = None  # 'tracking' | 'keyspace' | None
+        self.configure_keyspace = configure_keyspace
+        self._saved_events = None  # прежнее значение notify-keyspace-events, если меняли
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    async def start(self):
+        conn = self.pool.make_connection()  # отдельное соединение только для уведомлений
+        await conn.connect()
+
+        if await self._command(conn, 'CLIENT', 'TRACKINGINFO') is not None:
+            client_id = await self._command(conn, 'CLIENT', 'ID')
+            await self._command(conn, 'SUBSCRIBE', '__redis__:invalidate')
+            # соединения для GET сообщают серверу: об изменениях отслеживаемых ключей писать в conn
+            self.pool = aioredis.ConnectionPool(
+                connection_class=self.pool.connection_class,
+                max_connections=self.pool.max_connections,
+                **self.pool.connection_kwargs | {'redis_connect_func': _tracking_setup(client_id)}
+            )
+            self.redis = aioredis.Redis(connection_pool=self.pool)
+            self.mode = 'tracking'
+        else:
+            events = await self._command(conn, 'CONFIG', 'GET', 'notify-keyspace-events')
+            flags = events[1].decode() if events else None  # None – CONFIG запрещен, решит проба
+            usable = flags is None or _keyspace_enabled(flags)
+            if not usable and self.configure_keyspace:
+                await self._command(conn, 'CONFIG', 'SET', 'notify-keyspace-events', ''.join(set(flags) | set('KA')))
+                self._saved_events = flags
+                usable = True
+
+            if usable:  # проверяем, что уведомления действительно приходят
+                db = self.pool.connection_kwargs.get('db', 0)
+                await self._command(conn, 'PSUBSCRIBE', f'__keyspace@{db}__:*')
+                probe = f'cache-probe:{uuid4().hex}'
+                await self.redis.set(probe, 1, px=1000)
+                try:
+                    async with asyncio.timeout(1):
+                        while (await conn.read_response())[2] != f'__keyspace@{db}__:{probe}'.encode():
+                            pass
+                    self.mode = 'keyspace'
+                except TimeoutError:
+                    pass
+
+        if self.mode is None:
+            await conn.disconnect()
+        else:
+            self._listener = asyncio.create_task(self._listen(conn))
+        return self
+
+    @staticmethod
+    async def _command(conn, *args):
+        await conn.send_command(*args)
+        try:
+            return await conn.read_response()
+        except ResponseError:  # команда не поддерживается или запрещена
+            return None
+
+    async def _listen(self, conn):
+        try:
+            while True:
+                message = await conn.read_response()
+                kind = message[0]
+                if kind == b'message':  # ['message', '__redis__:invalidate', [key, ...] | None]
+                    keys = message[2]
+                elif kind == b'pmessage':  # ['pmessage', pattern, '__keyspace@0__:key', event]
+                    keys = [message[2].split(b':', 1)[1]]
+                else:
+                    continue
+                self.invalidate(keys)
+        except (ConnectionError, OSError, aioredis.RedisError):
+            # без уведомлений кэш может устареть – выключаем его
+            self.mode = None
+            self.invalidate(None)
+        finally:
+            await conn.disconnect()
+
+    def invalidate(self, keys):  # None – сброс всего кэша (FLUSHALL)
+        if keys is None:
+            self.invalidations += len(self.cache)
+            self.cache.clear()
+            self.pending.clear()
+            return
+        for key in keys:
+            if self.cache.pop(key, None) is not None:
+                self.invalidations += 1
+            self.pending.pop(key, None)
+
+    async def get(self, key):
+        if self.mode is None:
+            return await self.redis.get(key)
+
+        key = _encode(key)
+        entry = self.cache.get(key)
+        if entry is not None:
+            value, expires = entry
+            if expires > monotonic():
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.cache[key]
+
+        self.misses += 1
+        token = self.pending[key] = object()
+        value = await self.redis.get(key)
+
+        if self.pending.get(key) is token:  # за время запроса ключ не менялся
+            del self.pending[key]
+            self.cache[key] = value, monotonic() + self.ttl
+            if len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def __getattr__(self, name):  # set, delete, ... – без кэша
+        command = getattr(self.redis, name)
+        if self.mode is None or name not in WRITE_COMMANDS:
+            return command
+
+        async def write(*args, **kwargs):
+            # уведомление о своей записи приходит асинхронно – GET сразу после SET увидел бы старое значение
+            keys = WRITE_COMMANDS[name](*args, **kwargs)
+            self.invalidate(keys)  # и GET в полете не положит в кэш то, что прочитал до записи
+            try:
+                return await command(*args, **kwargs)
+            finally:
+                self.invalidate(keys)  # GET, завершившийся во время записи, мог закэшировать старое
+
+        return write
+
+    def stats(self):
+        return {
+            'mode': self.mode, 'size': len(self.cache), 'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions, 'invalidations': self.invalidations,
+        }
+
+    async def aclose(self):
+        if self.mode is not None:
+            self._listener.cancel()
+        if self._saved_events is not None:  # настройка сервера – как была до start()
+            await self.redis.config_set('notify-keyspace-events', self._saved_events)
+        await self.redis.aclose()
+
+
+KEYSPACE_EVENTS = set('g$xe')  # DEL / EXPIRE / RENAME, строковые команды, истечение TTL, вытеснение
+
+
+def _keyspace_enabled(flags):
+    return 'K' in flags and ('A' in flags or KEYSPACE_EVENTS <= set(flags))
+
+
+def _encode(key):
+    return key.encode() if isinstance(key, str) else key
+
+
+def _first_key(key, *args, **kwargs):
+    return [_encode(key)]
+
+
+def _all_keys(*keys):
+    return [_encode(key) for key in keys]
+
+
+def _mapping_keys(mapping, *args, **kwargs):
+    return [_encode(key) for key in mapping]
+
+
+# команды записи через CachedRedis: {имя метода: ключи, которые она меняет; None – все}
+WRITE_COMMANDS = {
+    name: _first_key for name in (
+        'set', 'setex', 'psetex', 'setnx', 'setrange', 'getset', 'getdel', 'getex', 'append',
+        'incr', 'incrby', 'incrbyfloat', 'decr', 'decrby',
+        'expire', 'pexpire', 'expireat', 'pexpireat', 'persist',
+    )
+} | {
+    'delete': _all_keys, 'unlink': _all_keys,
+    'rename': lambda src, dst: _all_keys(src, dst), 'renamenx': lambda src, dst: _all_keys(src, dst),
+    'mset': _mapping_keys, 'msetnx': _mapping_keys,
+    'flushdb': lambda *args, **kwargs: None, 'flushall': lambda *args, **kwargs: None,
+}
+
+
+def _tracking_setup(redirect_id):
+    # redis_connect_func вызывается после каждого подключения вместо стандартной настройки соединения;
+    # переопределенный on_connect не подходит – redis-py 5+ сам его не вызывает
+    async def on_connect(conn):
+        await conn.on_connect()  # AUTH, SELECT, ... – как без redis_connect_func
+        await conn.send_command('CLIENT', 'TRACKING', 'ON', 'REDIRECT', redirect_id)
+        await conn.read_response()  # ошибка – ResponseError, соединение не попадет в пул
+
+    return on_connect
+
+
+pools = {}  # {url: ConnectionPool}  # один пул на процесс вместо from_url на каждое использование
+caches = {}  # {url: CachedRedis}
+
+
 @asynccontextmanager
-async def redis_connection():
+async def redis_connection(url='redis://localhost', cache=False):
+    if url not in pools:
+        pools[url] = aioredis.ConnectionPool.from_url(url, max_connections=50)
+
+    if cache:
+        if url not in caches:
+            caches[url] = await CachedRedis(pools[url]).start()
+        yield caches[url]
+        return
+
+    redis = aioredis.Redis(connection_pool=pools[url])
     try:
-        redis = await aioredis.from_url('redis://localhost')
         yield redis
     finally:
-        await redis.close()
+        await redis.aclose()  # соединение возвращается в пул, пул остается открытым
 
 
 async def main():
+    if '--fake' in sys.argv:  # без redis-server: python 12_async_gens_context_managers.py --fake
+        from fakeredis import aioredis as fake
+        pools['redis://localhost'] = fake.FakeRedis().connection_pool
+
     async with redis_connection() as redis:
         await redis.set('course', 'asyncio')
 
+    async with redis_connection(cache=True) as redis:
+        print(await redis.get('course'))  # b'asyncio'  # из redis
+        print(await redis.get('course'))  # b'asyncio'  # из кэша
+        await redis.set('course', 'trio')  # запись через кэш сразу убирает ключ из кэша
+        print(await redis.get('course'))  # b'trio'
+
+        t0 = perf_counter()
+        for _ in range(100_000):
+            await redis.get('course')
+        print(f'100000 GET: {perf_counter() - t0:.3f}s')
+        print(redis.stats())
+
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -1,5 +1,10 @@
 import asyncio
+import sys
 from random import randint
+from time import perf_counter
+
+from autoscale import ConsumerPool, TimedQueue
+from batch_queue import BatchQueue
 
 
 class Color:
@@ -18,28 +23,80 @@ async def producer(queue: asyncio.Queue, num: int):
     await asyncio.sleep(timeout)
 
 
-async def consumer(queue: asyncio.Queue, num: int):
-    # while not queue.empty():
-    while True:
-        timeout = await queue.get()
-        print(f'{c.green}Consumer {num} get {timeout}{c.norm} {queue}')
-        await asyncio.sleep(timeout)
-        queue.task_done()
+async def consumer(timeout):
+    # цикл while True: queue.get() ... task_done() – в ConsumerPool, здесь обработка одного элемента
+    print(f'{c.green}{asyncio.current_task().get_name()} get {timeout}{c.norm}')
+    await asyncio.sleep(timeout)
 
 
 async def main():
-    queue = asyncio.Queue(maxsize=4)
+    queue = TimedQueue(maxsize=4)
     producers = [asyncio.create_task(producer(queue, i)) for i in range(12)]
-    consumers = [asyncio.create_task(consumer(queue, i)) for i in range(3)]
+    # вместо 3 фиксированных потребителей – от 1 до 6, по времени ожидания в очереди
+    consumers = ConsumerPool(queue, consumer, min_workers=1, max_workers=6, name='Consumer').start()
     # create_task запускает в event loop корутины, gather позволяет дождаться завершения
     await asyncio.gather(*producers)
     await queue.join()  # завершается при опустошении очереди
 
+    await consumers.stop()
+
+    print(queue)
+
+
+# та же схема (12 производителей, 3 потребителя) под нагрузкой: python 13_async_queue.py --benchmark
+
+async def run_topology(queue, produce, consume, n, producers=12, consumers=3):
+    t0 = perf_counter()
+    consumers = [asyncio.create_task(consume(queue)) for _ in range(consumers)]
+    await asyncio.gather(*(produce(queue, n // producers + (i < n % producers)) for i in range(producers)))
+    await queue.join()
+    elapsed = perf_counter() - t0
     for consume in consumers:
         consume.cancel()
+    return elapsed
 
-    print(queue)
+
+async def produce_one(queue: asyncio.Queue, count):
+    for i in range(count):
+        await queue.put(i)
+
+
+async def consume_one(queue: asyncio.Queue):
+    while True:
+        await queue.get()  # одно пробуждение и один task_done на каждый элемент
+        queue.task_done()
+
+
+async def produce_many(queue: BatchQueue, count, chunk=1000):
+    for i in range(0, count, chunk):
+        await queue.put_many(range(i, min(i + chunk, count)))
+
+
+async def consume_many(queue: BatchQueue):
+    while True:
+        batch = await queue.get_many(1000)
+        queue.task_done(len(batch))
+
+
+async def lanes_demo():
+    # все полосы заполнены: high получает втрое больше места в пачке, low не голодает
+    queue = BatchQueue(lanes={'high': 3, 'low': 1})
+    await queue.put_many((f'low {i}' for i in range(100)), lane='low')
+    await queue.put_many((f'high {i}' for i in range(100)), lane='high')
+    batch = await queue.get_many(40)
+    print(f"high: {sum(x.startswith('high') for x in batch)}, low: {sum(x.startswith('low') for x in batch)}")  # 30, 10
+
+
+async def benchmark(n=1_000_000):
+    for name, queue, produce, consume in (
+        ('asyncio.Queue', asyncio.Queue(maxsize=10_000), produce_one, consume_one),
+        ('BatchQueue   ', BatchQueue(maxsize=10_000), produce_many, consume_many),
+    ):
+        elapsed = await run_topology(queue, produce, consume, n)
+        print(f'{name} {n} items: {elapsed:.2f}s  {n / elapsed:,.0f} items/s')
+
+    await lanes_demo()
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    asyncio.run(benchmark() if '--benchmark' in sys.argv else main())
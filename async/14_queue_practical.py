@@ -3,28 +3,44 @@ The https://xkcd.com asynchronous crawler
 """
 
 import asyncio
+import os
+import sys
 from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
+from time import perf_counter
 from urllib.parse import urlparse
 
 import aiohttp
-import aiofiles
 from bs4 import BeautifulSoup
 
+from autoscale import ConsumerPool, TimedQueue
+from crawl_state import CrawlState
+from http_cache import HTTPCache
+from metrics import Metrics
+from stream_writer import StreamWriter
+
 URL = 'https://c.xkcd.com/random/comic/'
 
-async def make_request(url, session: aiohttp.ClientSession):
-    response = await session.get(url)
+metrics = Metrics()  # JSON в stdout каждые 5 с, Prometheus – http://localhost:9100/metrics
+
+async def make_request(url, session: aiohttp.ClientSession, cache: HTTPCache = None):
+    if cache is not None:  # повторные страницы и картинки – из кэша, с проверкой через ETag
+        response = await cache.fetch(session, url)
+    else:
+        response = await session.get(url)
     if response.ok:
         return response
     else:
         print(f'{url}, returned: {response.status}')
 
 
-async def get_image_page(queue: asyncio.Queue, session):
+async def get_image_page(queue: asyncio.Queue, session, state: CrawlState, cache=None):
     url = URL
-    response = await make_request(url, session)
-    await queue.put(response.url)
+    with metrics.stage('page').time():
+        response = await make_request(url, session, cache)
+    if state.add('pages', str(response.url)):  # случайные страницы повторяются – повторно не разбираем
+        await queue.put(str(response.url))
 
 
 def _parse_link(html):
@@ -33,67 +49,194 @@ def _parse_link(html):
     return image_link
 
 
-async def get_image_url(pages_queue: asyncio.Queue, image_urls_queue: asyncio.Queue, session):
-    while True:
-        url = await pages_queue.get()
-        response = await make_request(url, session)
-        html = await response.text()
+def _parse_links(pages):
+    # одна пачка – один pickle и один обмен с процессом; ошибка страницы не роняет всю пачку
+    results = []
+    for html in pages:
+        try:
+            results.append(_parse_link(html))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _prewarm():
+    # initializer: bs4 и lxml импортируются при старте процесса, а не на первой странице
+    BeautifulSoup('<html></html>', 'lxml')
 
-        # запустить сихронный код парсера
+
+class ParsePool:
+    # один пул процессов по числу ядер на все время обхода вместо нового ProcessPoolExecutor на каждую страницу;
+    # страницы копятся до batch_size или linger секунд и уходят в процесс пачкой
+    def __init__(self, workers=None, batch_size=8, linger=0.01):
+        self.workers = workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_prewarm)
+        self.batch_size = batch_size
+        self.linger = linger
+        self.batch = []  # [(html, future)]
+        self.flush_handle = None
+
+    async def start(self):
+        # процессы создаются по требованию – запускаем все сразу, пока сеть еще не отдала первые страницы
         loop = asyncio.get_running_loop()
-        with ProcessPoolExecutor() as pool:
-            image_link = await loop.run_in_executor(
-                pool, _parse_link, html
-            )
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _parse_links, []) for _ in range(self.workers)))
+        return self
+
+    async def parse(self, html):
+        future = asyncio.get_running_loop().create_future()
+        self.batch.append((html, future))
+        if len(self.batch) >= self.batch_size:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.linger, self._flush)
+        return await future
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.batch = self.batch, []
+        done = asyncio.wrap_future(self.executor.submit(_parse_links, [html for html, _ in batch]))
+        done.add_done_callback(partial(self._resolve, batch))
+
+    @staticmethod
+    def _resolve(batch, done: asyncio.Future):
+        if done.cancelled():  # close() отменил пакет: exception() здесь сам бросил бы CancelledError
+            for _, future in batch:
+                future.cancel()  # отмена, а не set_exception(CancelledError()) – ожидающий видит настоящую отмену
+            return
+        if done.exception() is not None:
+            results = [done.exception()] * len(batch)
+        else:
+            results = done.result()
+        for (_, future), result in zip(batch, results):
+            if future.done():  # ожидающая задача уже отменена
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+async def get_image_url(url, image_urls_queue: asyncio.Queue, session, parser: ParsePool, state: CrawlState,
+                        cache=None):
+    # обработка одной страницы; цикл по очереди и task_done – в ConsumerPool
+    with metrics.stage('fetch').time():
+        response = await make_request(url, session, cache)
+        html = await response.text()
 
-        await image_urls_queue.put(image_link)
+    # запустить сихронный код парсера в общем пуле процессов
+    with metrics.stage('parse').time():
+        image_link = await parser.parse(html)
 
-        pages_queue.task_done()
+    if state.add('images', image_link):
+        await image_urls_queue.put(image_link)
+    state.done('pages', url)  # после записи картинки в очередь: при падении страница разберется заново
 
 
-async def download_image(queue: asyncio.Queue, session):
-    while True:
-        url = await queue.get()
-        response = await make_request(url, session)
+async def download_image(url, session, state: CrawlState, cache=None):
+    stage = metrics.stage('download')
+    with stage.time():
+        response = await make_request(url, session, cache)
         filename = Path(urlparse(url).path).name
         folder = Path('./pictures')
         folder.mkdir(exist_ok=True)
 
-        async with aiofiles.open(folder.joinpath(filename), 'wb') as file:
-            async for chunk in response.content.iter_chunked(1024):
-                await file.write(chunk)
+        if cache is not None:
+            await response.save(folder.joinpath(filename))  # ссылка на тело в кэше, без повторной записи
+            if not response.from_cache:
+                stage.bytes += response.size
+        else:
+            # куски – какими пришли из сети, на диск – блоками по 256 KB через временный файл
+            async with StreamWriter(folder.joinpath(filename), size=response.content_length) as file:
+                async for chunk in response.content.iter_any():
+                    await file.write(chunk)
+                    stage.bytes += len(chunk)
 
-        queue.task_done()
+    state.done('images', url)
 
 
 async def main():
     session = aiohttp.ClientSession()
-    pages_queue = asyncio.Queue()
-    image_urls_queue = asyncio.Queue()
+    cache = HTTPCache('.http_cache')
+    parser = await ParsePool().start()
+    state = CrawlState('.crawl_state.sqlite')
+    pages_queue = TimedQueue()
+    image_urls_queue = TimedQueue()
+
+    # необработанное с прошлого (прерванного) запуска
+    for url in state.pending('pages'):
+        pages_queue.put_nowait(url)
+    for url in state.pending('images'):
+        image_urls_queue.put_nowait(url)
+
+    metrics.watch('pages_queue', pages_queue)
+    metrics.watch('image_urls_queue', image_urls_queue)
+    await metrics.start()
 
     page_getters = [asyncio.create_task(
-        get_image_page(pages_queue, session)
+        get_image_page(pages_queue, session, state, cache)
     ) for i in range(5)]
 
-    url_getters = [asyncio.create_task(
-        get_image_url(pages_queue, image_urls_queue, session)
-    ) for i in range(5)]
+    # число задач на стадии подстраивается под очередь: от 1 до 10 вместо фиксированных 5
+    url_getters = ConsumerPool(
+        pages_queue,
+        partial(get_image_url, image_urls_queue=image_urls_queue, session=session, parser=parser, state=state, cache=cache),
+        min_workers=1, max_workers=10, name='url_getter'
+    ).start()
 
-    downloaders = [asyncio.create_task(
-        download_image(image_urls_queue, session)
-    ) for i in range(5)]
+    downloaders = ConsumerPool(
+        image_urls_queue, partial(download_image, session=session, state=state, cache=cache),
+        min_workers=1, max_workers=10, name='downloader'
+    ).start()
 
     await asyncio.gather(*page_getters)
 
     await pages_queue.join()
-    for task in url_getters:
-        task.cancel()
+    await url_getters.stop()
 
     await image_urls_queue.join()
-    for task in downloaders:
-        task.cancel()
+    await downloaders.stop()
+    await metrics.stop()
 
     await session.close()
+    parser.close()
+    cache.close()
+    print(state.stats())
+    state.close()
+
+
+# разбор без сети: python 14_queue_practical.py --benchmark
+
+def fake_page(i):
+    return f'<html><body>{"<p>text</p>" * 500}<div id="comic"><img src="//imgs.xkcd.com/comics/{i}.png"></div></body></html>'
+
+
+async def benchmark(n=200, concurrency=10):
+    pages = [fake_page(i) for i in range(n)]
+    loop = asyncio.get_running_loop()
+
+    async def per_page(html):  # как было: новый пул процессов на каждую страницу
+        with ProcessPoolExecutor() as pool:
+            return await loop.run_in_executor(pool, _parse_link, html)
+
+    t0 = perf_counter()
+    for i in range(0, n, concurrency):
+        await asyncio.gather(*(per_page(html) for html in pages[i:i + concurrency]))
+    print(f'pool per page: {n / (perf_counter() - t0):.0f} pages/s')
+
+    t0 = perf_counter()
+    parser = await ParsePool().start()
+    print(f'ParsePool start: {perf_counter() - t0:.2f}s')
+    t0 = perf_counter()
+    for i in range(0, n, concurrency):
+        await asyncio.gather(*(parser.parse(html) for html in pages[i:i + concurrency]))
+    print(f'ParsePool:     {n / (perf_counter() - t0):.0f} pages/s')
+    parser.close()
+
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    asyncio.run(benchmark() if '--benchmark' in sys.argv else main())
@@ -1,25 +1,76 @@
 # python -m pip install 'fastapi[all]'
 # uvicorn 15_0_server:app --reload
+# uvicorn 15_0_server:app --workers 4  # счетчик общий для всех воркеров
+# python 15_0_server.py  # запросов в секунду к /hello без кэша и с кэшем ответа
 import asyncio
+from contextlib import asynccontextmanager
+from time import perf_counter
+
 from fastapi import FastAPI
 
-app = FastAPI()
-lock = asyncio.Lock()
-count = 0
+from response_cache import FastJSONResponse, ResponseCacheMiddleware, cache_response
+from shared_counter import ShardedCounter
+
+counter = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # в каждом процессе-воркере uvicorn: своя ячейка в общей памяти
+    global counter
+    counter = ShardedCounter('requests').start()
+    yield
+    counter.close()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+app.add_middleware(ResponseCacheMiddleware)
+
 
 @app.get('/')
 async def main():
-    global count
-
+    # было: замок на каждый запрос выстраивает их в очередь, а с --workers N у каждого процесса свой count
     # await lock.acquire()  # нацепить замок
     # count += 1
     # await lock.release()  # снять замок
-    async with lock:
-        count += 1
+    # async with lock:
+    #     count += 1
+    counter.increment()  # между await нет – другая корутина не вклинится, замок не нужен
 
-    return {'count': count}
+    return {'count': counter.value}
 
 
 @app.get('/hello')
+@cache_response()  # ответ не меняется: после первого запроса отдаются готовые байты
 async def greet():
     return {'msg': 'Hello world'}
+
+
+async def benchmark(n=20_000):
+    # ASGI-приложение вызывается напрямую, без сети: видна только цена обработки в самом фреймворке
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': '/hello', 'raw_path': b'/hello', 'root_path': '', 'query_string': b'', 'headers': [],
+        'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 8000),
+    }
+    body = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            body.append(message['body'])
+
+    plain = FastAPI()  # как было: без кэша, стандартный JSONResponse
+    plain.get('/hello')(greet)
+
+    for name, application in ('plain', plain), ('cached', app):
+        t0 = perf_counter()
+        for _ in range(n):
+            await application(dict(scope), receive, send)
+        print(f'{name:>6}: {n / (perf_counter() - t0):,.0f} req/s  {body[-1]}')
+
+
+if __name__ == '__main__':
+    asyncio.run(benchmark())
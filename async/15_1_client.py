@@ -2,55 +2,47 @@ import asyncio
 import time
 
 import aiohttp
+from yarl import URL
+
+from rate_limit import Keyed, TokenBucket, rate_limited
 
 
 # lock = asyncio.Lock()
 # semaphore = asyncio.Semaphore(4)
 
 
-def limit_rate(calls_limit=5, timeout=5):
-    def wrapper(coro):
-        semaphore = asyncio.Semaphore(calls_limit)
-
-        async def wait():
-            try:
-                await asyncio.sleep(timeout)
-            finally:
-                semaphore.release()
-
-        async def inner_coro(*args, **kwargs):
-            await semaphore.acquire()
-            asyncio.create_task(wait())  # иначе пауза перед первыми запросами
-            return await coro(*args, **kwargs)
+# было: Semaphore + create_task(wait()) на каждый вызов – тысячи спящих задач при тысячах вызовов в секунду;
+# теперь ограничитель – очередь future и один таймер loop.call_at (rate_limit.py)
 
-        return inner_coro
+# на каждый хост свое ведро: 5 запросов сразу, затем 0.5 запроса в секунду (как было: 5 запросов за 10 секунд)
+per_host = Keyed(lambda: TokenBucket(rate=0.5, burst=5))
+# per_host = Keyed(lambda: SlidingWindow(limit=5, period=10))  # строго не больше 5 за любые 10 секунд
 
-    return wrapper
 
-
-@limit_rate(calls_limit=5, timeout=10)
-async def make_request(url):
-    async with aiohttp.ClientSession() as session:
-        # async with lock:
-        # async with semaphore:
-        async with session.get(url) as response:
-            data = await response.json()
-            print(data)
-            await asyncio.sleep(1)
+@rate_limited(per_host, key=lambda url, session: URL(url).host)
+async def make_request(url, session: aiohttp.ClientSession):
+    # async with lock:
+    # async with semaphore:
+    async with session.get(url) as response:
+        data = await response.json()
+        print(data)
+        await asyncio.sleep(1)
 
 
-async def get_data(url):
-    await make_request(url)
+async def get_data(url, session):
+    await make_request(url, session)
 
 
 async def main():
     start = time.monotonic()
 
-    tasks = [asyncio.create_task(
-        get_data('http://localhost:8000')
-    ) for _ in range(20)]
+    # одна сессия на все запросы: соединения переиспользуются, а не открываются на каждый запрос
+    async with aiohttp.ClientSession() as session:
+        tasks = [asyncio.create_task(
+            get_data('http://localhost:8000', session)
+        ) for _ in range(20)]
 
-    await asyncio.gather(*tasks)
+        await asyncio.gather(*tasks)
 
     print(time.monotonic() - start)
 
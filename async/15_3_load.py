@@ -0,0 +1,165 @@
+"""
+Нагрузочный клиент для 15_0_server.py: задержки по перцентилям вместо общего времени
+
+uvicorn 15_0_server:app --workers 4
+python 15_3_load.py --mode open --rate 2000 -c 50 -d 10       # открытый цикл: 2000 запросов/с по расписанию
+python 15_3_load.py --mode closed -c 50 -d 10                  # замкнутый: следующий запрос – сразу после ответа
+python 15_3_load.py --url http://localhost:8000/ -o load.json
+
+Все воркеры прогревают соединение и ждут друг друга у StartGate (Condition, как в 15_2_client.py,
+но замок держится только на время ожидания старта – сами запросы идут параллельно).
+
+Coordinated omission: если сервер замер на секунду, замкнутый клиент за эту секунду просто ничего
+не отправляет, и в статистику попадает один медленный запрос вместо сотни.
+- open: задержка считается от запланированного времени отправки, а не от фактического –
+  ожидание свободного соединения входит в задержку (как в wrk2);
+- closed: к «сырой» гистограмме добавляется исправленная – для каждого медленного запроса дописываются
+  задержки пропущенных (ожидаемый интервал – средняя задержка на момент записи).
+"""
+
+import argparse
+import asyncio
+import json
+from itertools import count
+
+import aiohttp
+
+from metrics import Histogram
+
+REPORT = {'p50': 0.5, 'p75': 0.75, 'p90': 0.9, 'p99': 0.99, 'p99.9': 0.999, 'p99.99': 0.9999}
+
+
+class StartGate:
+    # в 15_2_client.py запрос выполнялся внутри async with condition – запросы шли по одному
+    def __init__(self, parties):
+        self.condition = asyncio.Condition()
+        self.parties = parties
+        self.arrived = 0
+        self.start = None
+
+    async def wait(self):
+        async with self.condition:
+            self.arrived += 1
+            if self.arrived == self.parties:
+                self.start = asyncio.get_running_loop().time()
+                self.condition.notify_all()
+            else:
+                await self.condition.wait_for(lambda: self.start is not None)
+        return self.start  # замок уже отпущен
+
+
+class Stats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.corrected = Histogram()
+        self.requests = 0
+        self.errors = 0
+
+
+async def request(session: aiohttp.ClientSession, url):
+    async with session.get(url) as response:
+        await response.read()
+        return response.status < 400
+
+
+async def open_worker(session, url, gate: StartGate, stats: Stats, schedule, rate, duration):
+    loop = asyncio.get_running_loop()
+    await request(session, url)  # прогрев: соединение открыто до старта
+    start = await gate.wait()
+
+    for i in schedule:  # общий на всех воркеров счетчик: номер следующего запроса по расписанию
+        intended = start + i / rate
+        if intended >= start + duration:
+            return
+        if intended > loop.time():
+            await asyncio.sleep(intended - loop.time())
+        try:
+            ok = await request(session, url)
+        except aiohttp.ClientError:
+            ok = False
+        stats.requests += 1
+        if ok:
+            stats.latency.record(loop.time() - intended)  # от запланированного времени
+        else:
+            stats.errors += 1
+
+
+async def closed_worker(session, url, gate: StartGate, stats: Stats, duration):
+    loop = asyncio.get_running_loop()
+    await request(session, url)
+    start = await gate.wait()
+
+    while loop.time() < start + duration:
+        t0 = loop.time()
+        try:
+            ok = await request(session, url)
+        except aiohttp.ClientError:
+            ok = False
+        stats.requests += 1
+        if ok:
+            elapsed = loop.time() - t0
+            stats.latency.record(elapsed)
+            stats.corrected.record_corrected(elapsed, stats.latency.total / stats.latency.count)
+        else:
+            stats.errors += 1
+
+
+async def run(args):
+    stats = Stats()
+    gate = StartGate(args.connections)
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    loop = asyncio.get_running_loop()
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        if args.mode == 'open':
+            schedule = count()
+            workers = [
+                open_worker(session, args.url, gate, stats, schedule, args.rate, args.duration)
+                for _ in range(args.connections)
+            ]
+        else:
+            workers = [closed_worker(session, args.url, gate, stats, args.duration) for _ in range(args.connections)]
+        await asyncio.gather(*workers)
+        elapsed = loop.time() - gate.start
+
+    return report(args, stats, elapsed)
+
+
+def report(args, stats: Stats, elapsed):
+    histograms = {'latency': stats.latency}
+    if args.mode == 'closed':
+        histograms['corrected'] = stats.corrected
+
+    result = {
+        'url': args.url, 'mode': args.mode, 'connections': args.connections, 'duration': round(elapsed, 3),
+        'rate': args.rate if args.mode == 'open' else None,
+        'requests': stats.requests, 'errors': stats.errors, 'throughput': round(stats.requests / elapsed, 1),
+        **{
+            name: {key: round(hist.quantile(q) * 1000, 3) for key, q in REPORT.items()} | {'max': round(hist.max * 1000, 3)}
+            for name, hist in histograms.items()
+        },
+    }
+
+    print(f"{args.mode} loop, {args.connections} connections, {elapsed:.1f}s"
+          + (f', target {args.rate}/s' if args.mode == 'open' else ''))
+    print(f"{stats.requests} requests, {stats.errors} errors, {result['throughput']} req/s")
+    print(f"{'ms':>8}" + ''.join(f'{name:>12}' for name in histograms))
+    for key in [*REPORT, 'max']:
+        print(f'{key:>8}' + ''.join(f'{result[name][key]:>12.3f}' for name in histograms))
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://localhost:8000/hello')
+    parser.add_argument('--mode', choices=['open', 'closed'], default='open')
+    parser.add_argument('-r', '--rate', type=float, default=1000, help='запросов в секунду (open)')
+    parser.add_argument('-c', '--connections', type=int, default=50)
+    parser.add_argument('-d', '--duration', type=float, default=10, help='секунд')
+    parser.add_argument('-o', '--output', help='сохранить отчет в JSON')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(result, file, indent=2)
@@ -0,0 +1,139 @@
+"""
+Комбинаторы асинхронных итераторов (используется в 11_async_comprehensions.py и 09_1_bounded_map.py)
+
+Принимают как асинхронные, так и обычные итерируемые объекты и сами являются асинхронными генераторами.
+При выходе из цикла раньше времени закрывайте их через aclosing – фоновые задачи отменятся сразу.
+
+async for users in achunk(get_user(100), 10)  # списки по 10
+async for x in amap(fetch, urls, concurrency=20)  # до 20 вызовов одновременно, результаты в порядке входа
+async for x in prefetch(get_user(100), depth=10)  # источник работает впереди потребителя
+async for x in amerge(source_1, source_2)  # по мере готовности из любого источника
+async for batch in abatch_with_timeout(source, 100, 0.5)  # 100 элементов или 0.5 с от первого в пачке
+async for x in aiter_any(range(10))  # обычный итерируемый объект как асинхронный
+"""
+
+import asyncio
+from collections import deque
+
+_DONE = object()  # конец источника в очереди
+
+
+async def aiter_any(iterable):
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+async def achunk(iterable, n):
+    chunk = []
+    async for item in aiter_any(iterable):
+        chunk.append(item)
+        if len(chunk) == n:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def amap(fn, iterable, concurrency=10):
+    # в работе не больше concurrency корутин; результат отдается, когда готов самый старый вызов
+    pending = deque()
+    try:
+        async for item in aiter_any(iterable):
+            pending.append(asyncio.create_task(fn(item)))
+            if len(pending) == concurrency:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:  # break, ошибка fn или в теле цикла – не оставлять висящих задач
+        for task in pending:
+            task.cancel()
+
+
+async def _pump(iterable, queue: asyncio.Queue):
+    try:
+        async for item in aiter_any(iterable):
+            await queue.put((item, None))  # очередь полна – источник ждет потребителя
+    except Exception as e:
+        await queue.put((_DONE, e))
+    else:
+        await queue.put((_DONE, None))
+
+
+async def prefetch(iterable, depth=1):
+    # источник читается в отдельной задаче и опережает потребителя не больше чем на depth элементов
+    queue = asyncio.Queue(maxsize=depth)
+    task = asyncio.create_task(_pump(iterable, queue))
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        task.cancel()
+
+
+async def amerge(*iterables, depth=1):
+    queue = asyncio.Queue(maxsize=depth)
+    tasks = [asyncio.create_task(_pump(iterable, queue)) for iterable in iterables]
+    running = len(tasks)
+    try:
+        while running:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error  # остальные источники отменяются в finally
+                running -= 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _anext(iterator):
+    return await anext(iterator)
+
+
+async def abatch_with_timeout(iterable, n, timeout):
+    # пачка уходит, когда набралось n элементов или прошло timeout секунд с первого элемента в ней:
+    # при медленном источнике элементы не ждут, пока наберется полная пачка
+    loop = asyncio.get_running_loop()
+    items = aiter_any(iterable)
+    batch = []
+    deadline = None
+    next_item = None  # задача чтения следующего элемента переживает таймаут и не теряет элемент
+    try:
+        while True:
+            if next_item is None:
+                next_item = asyncio.create_task(_anext(items))
+            if deadline is not None:
+                await asyncio.wait([next_item], timeout=deadline - loop.time())
+                if not next_item.done():
+                    yield batch
+                    batch, deadline = [], None
+                    continue
+            try:
+                item = await next_item
+            except StopAsyncIteration:
+                break
+            finally:
+                next_item = None
+
+            if not batch:
+                deadline = loop.time() + timeout
+            batch.append(item)
+            if len(batch) == n:
+                yield batch
+                batch, deadline = [], None
+        if batch:
+            yield batch
+    finally:
+        if next_item is not None:
+            next_item.cancel()
@@ -0,0 +1,161 @@
+"""
+Пул потребителей очереди, который сам подбирает число задач (используется в 13_async_queue.py и 14_queue_practical.py)
+
+Вместо фиксированных N задач с while True: queue.get() пул держит от min_workers до max_workers задач
+и раз в interval секунд смотрит на:
+- глубину очереди,
+- сколько ждет самый старый элемент (TimedQueue помнит время постановки; для обычной очереди – оценка),
+- среднее время обработки одного элемента.
+
+Рост: самый старый элемент ждет дольше high_wait – сразу добавляем столько задач,
+сколько нужно, чтобы разобрать очередь за high_wait (но не больше чем вдвое за раз).
+Сокращение: ожидание меньше low_wait и есть простаивающие задачи cooldown проверок подряд – минус одна задача.
+Полоса между low_wait и high_wait и cooldown не дают пулу дергаться туда-обратно.
+
+queue = TimedQueue()
+pool = ConsumerPool(queue, handle, min_workers=1, max_workers=20, name='downloader').start()
+...
+await queue.join()
+await pool.stop()
+"""
+
+import asyncio
+from collections import deque
+from math import ceil
+from time import monotonic, perf_counter
+
+
+class TimedQueue(asyncio.Queue):
+    # asyncio.Queue, которая помнит, когда положен каждый элемент (_put/_get – точки расширения Queue)
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self._times = deque()
+
+    def _put(self, item):
+        super()._put(item)
+        self._times.append(monotonic())
+
+    def _get(self):
+        self._times.popleft()
+        return super()._get()
+
+    def oldest_wait(self):
+        return monotonic() - self._times[0] if self._times else 0.0
+
+
+class ConsumerPool:
+    def __init__(self, queue: asyncio.Queue, handler, min_workers=1, max_workers=10, *,
+                 high_wait=1.0, low_wait=0.1, cooldown=5, interval=0.5, name='pool', verbose=True):
+        self.queue = queue
+        self.handler = handler  # async def handler(item) – обработка одного элемента
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.high_wait = high_wait
+        self.low_wait = low_wait
+        self.cooldown = cooldown
+        self.interval = interval
+        self.name = name
+        self.verbose = verbose
+
+        self.workers = set()
+        self.idle = set()  # ждут в queue.get – их можно отменить, не потеряв элемент
+        self.retire = 0  # столько занятых задач завершится после текущего элемента
+        self.busy = 0
+        self.processed = 0
+        self.proc_time = 0.0  # скользящее среднее времени обработки
+        self._spawned = 0
+        self._supervisor = None
+
+    @property
+    def size(self):
+        return len(self.workers) - self.retire
+
+    def start(self):
+        for _ in range(self.min_workers):
+            self._spawn()
+        self._supervisor = asyncio.create_task(self._supervise(), name=f'{self.name}-supervisor')
+        return self
+
+    async def stop(self):
+        tasks = [self._supervisor, *self.workers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn(self):
+        self._spawned += 1
+        task = asyncio.create_task(self._worker(), name=f'{self.name}-{self._spawned}')
+        self.workers.add(task)
+        task.add_done_callback(self.workers.discard)
+
+    async def _worker(self):
+        task = asyncio.current_task()
+        while not self.retire:
+            self.idle.add(task)
+            try:
+                item = await self.queue.get()
+            finally:
+                self.idle.discard(task)
+
+            self.busy += 1
+            t0 = perf_counter()
+            try:
+                await self.handler(item)
+            except Exception as e:  # одна ошибка не должна останавливать стадию и вешать queue.join()
+                print(f'{task.get_name()}: {item!r} failed: {e!r}')
+            finally:
+                self.busy -= 1
+                elapsed = perf_counter() - t0
+                self.proc_time += (0.2 if self.processed else 1) * (elapsed - self.proc_time)
+                self.processed += 1
+                self.queue.task_done()
+        self.retire -= 1
+        self.workers.discard(task)
+
+    def _wait_time(self):
+        if isinstance(self.queue, TimedQueue):
+            return self.queue.oldest_wait()
+        return self.queue.qsize() * self.proc_time / max(self.size, 1)
+
+    def _resize(self, target, reason):
+        size = self.size
+        if self.verbose:
+            print(f'{self.name}: {size} -> {target} workers ({reason})')
+
+        for _ in range(size, target):
+            if self.retire:  # еще не успевшая завершиться задача остается
+                self.retire -= 1
+            else:
+                self._spawn()
+        for _ in range(target, size):
+            if self.idle:
+                task = self.idle.pop()
+                self.workers.discard(task)
+                task.cancel()
+            else:
+                self.retire += 1
+
+    async def _supervise(self):
+        calm = 0
+        while True:
+            await asyncio.sleep(self.interval)
+            size, depth, wait = self.size, self.queue.qsize(), self._wait_time()
+            reason = f'depth={depth} wait={wait:.2f}s proc={self.proc_time:.2f}s'
+
+            if wait > self.high_wait and size < self.max_workers:
+                need = ceil(depth * self.proc_time / self.high_wait) if self.proc_time else size + 1
+                self._resize(min(self.max_workers, max(size + 1, min(need, 2 * size))), reason)
+                calm = 0
+            elif wait < self.low_wait and self.busy < size and size > self.min_workers:
+                calm += 1
+                if calm >= self.cooldown:
+                    self._resize(size - 1, reason)
+                    calm = 0
+            else:
+                calm = 0
+
+    def stats(self):
+        return {
+            'workers': self.size, 'busy': self.busy, 'depth': self.queue.qsize(),
+            'wait': round(self._wait_time(), 3), 'proc_time': round(self.proc_time, 3), 'processed': self.processed,
+        }
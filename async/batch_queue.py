@@ -0,0 +1,169 @@
+"""
+Очередь для asyncio с пакетными операциями и приоритетными полосами (используется в 13_async_queue.py)
+
+asyncio.Queue передает по одному элементу: каждый get будит потребителя, каждый элемент – отдельный task_done.
+Здесь потребитель забирает до max_n элементов за одно пробуждение и отмечает их одним task_done(n).
+
+Полосы (lanes) – отдельные очереди с целыми весами. get_many разбирает их по Deficit Round Robin:
+при весах {'high': 3, 'low': 1} и заполненных полосах на 3 элемента из high приходится 1 из low,
+низкий приоритет не голодает, а пустые полосы не занимают место в пачке.
+
+queue = BatchQueue(maxsize=1000, lanes={'high': 3, 'low': 1})
+await queue.put_many(items, lane='low')
+batch = await queue.get_many(100, timeout=1)  # [] – если за секунду ничего не пришло
+...
+queue.task_done(len(batch))
+"""
+
+import asyncio
+from collections import deque
+
+DEFAULT_LANE = 'default'
+
+
+class BatchQueue:
+    def __init__(self, maxsize=0, lanes=None):
+        self.maxsize = maxsize  # 0 – без ограничения; общий на все полосы
+        self.weights = dict(lanes or {DEFAULT_LANE: 1})
+        if not all(isinstance(w, int) and w > 0 for w in self.weights.values()):
+            raise ValueError('lane weights must be positive integers')
+        self._lanes = {lane: deque() for lane in self.weights}
+        self._order = list(self.weights)
+        self._deficit = dict.fromkeys(self.weights, 0)  # сколько полоса еще может отдать в свой ход
+        self._cursor = 0  # чей ход
+        self._total_weight = sum(self.weights.values())
+        self._size = 0
+        self._getters = deque()
+        self._putters = deque()
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def __repr__(self):
+        lanes = ' '.join(f'{lane}={len(items)}' for lane, items in self._lanes.items())
+        return f'<BatchQueue maxsize={self.maxsize} {lanes} unfinished={self._unfinished}>'
+
+    def qsize(self, lane=None):
+        return self._size if lane is None else len(self._lanes[lane])
+
+    def empty(self):
+        return not self._size
+
+    def full(self):
+        return 0 < self.maxsize <= self._size
+
+    # ожидание
+
+    @staticmethod
+    def _wakeup(waiters, n=1):
+        while n and waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                n -= 1
+
+    async def _wait(self, waiters):
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():  # разбудили, но ждать больше некому – передаем дальше
+                self._wakeup(waiters)
+            elif waiter in waiters:
+                waiters.remove(waiter)
+            raise
+
+    # запись
+
+    def _put(self, items, lane):
+        self._lanes[lane].extend(items)
+        n = len(items)
+        self._size += n
+        self._unfinished += n
+        self._finished.clear()
+        self._wakeup(self._getters, n)
+
+    def put_nowait(self, item, lane=DEFAULT_LANE):
+        if self.full():
+            raise asyncio.QueueFull
+        self._put((item,), lane)
+
+    async def put(self, item, lane=DEFAULT_LANE):
+        while self.full():
+            await self._wait(self._putters)
+        self._put((item,), lane)
+
+    async def put_many(self, items, lane=DEFAULT_LANE):
+        # кладет сколько помещается, за остальным ждет освобождения места
+        items = list(items)
+        i = 0
+        while i < len(items):
+            while self.full():
+                await self._wait(self._putters)
+            space = len(items) - i if self.maxsize <= 0 else self.maxsize - self._size
+            self._put(items[i:i + space], lane)
+            i += space
+
+    # чтение
+
+    def _take(self, max_n):
+        batch = []
+        scale = max(1, max_n // self._total_weight)  # квант кратен весу: меньше переходов между полосами
+        while self._size and len(batch) < max_n:
+            lane = self._order[self._cursor]
+            items = self._lanes[lane]
+            if items:
+                if not self._deficit[lane]:  # начало хода полосы
+                    self._deficit[lane] = self.weights[lane] * scale
+                n = min(self._deficit[lane], len(items), max_n - len(batch))
+                if n == len(items):
+                    batch.extend(items)
+                    items.clear()
+                else:
+                    batch.extend([items.popleft() for _ in range(n)])
+                self._deficit[lane] -= n
+                self._size -= n
+                if self._deficit[lane] and items:  # пачка закончилась посреди хода – продолжим со следующей
+                    break
+            self._deficit[lane] = 0
+            self._cursor = (self._cursor + 1) % len(self._order)
+
+        self._wakeup(self._putters, len(batch))
+        if self._size:  # разбудили больше потребителей, чем элементов досталось – не теряем пробуждение
+            self._wakeup(self._getters)
+        return batch
+
+    def get_nowait(self):
+        if not self._size:
+            raise asyncio.QueueEmpty
+        return self._take(1)[0]
+
+    async def get(self):
+        while not self._size:
+            await self._wait(self._getters)
+        return self._take(1)[0]
+
+    async def get_many(self, max_n, timeout=None):
+        # ждет хотя бы один элемент (не дольше timeout) и забирает до max_n уже лежащих в очереди
+        if not self._size:
+            try:
+                async with asyncio.timeout(timeout):
+                    while not self._size:
+                        await self._wait(self._getters)
+            except TimeoutError:
+                return []
+        return self._take(max_n)
+
+    # учет обработанных
+
+    def task_done(self, n=1):
+        if n > self._unfinished:
+            raise ValueError('task_done() called too many times')
+        self._unfinished -= n
+        if not self._unfinished:
+            self._finished.set()
+
+    async def join(self):
+        if self._unfinished:
+            await self._finished.wait()
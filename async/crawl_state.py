@@ -0,0 +1,131 @@
+"""
+Состояние обхода для 14_queue_practical.py: что уже видели и что осталось сделать
+
+- ScalableBloomFilter – множество просмотренных url в памяти: ~15 бит на url при ошибке 0.1 %,
+  при заполнении добавляется следующий фильтр вдвое больше и с меньшей ошибкой.
+- Фильтр может ошибиться только в сторону «уже видели», поэтому положительный ответ
+  подтверждается точным множеством в SQLite – в память оно не загружается.
+- Очереди (frontier) пишутся в тот же SQLite: элемент удаляется только после обработки,
+  и после падения обход продолжается с необработанных элементов.
+
+state = CrawlState('.crawl_state.sqlite')
+for url in state.pending('pages'):  # остались с прошлого запуска
+    ...
+if state.add('pages', url):  # новый url: отмечен как увиденный и записан в очередь pages
+    await pages_queue.put(url)
+...
+state.done('pages', url)
+state.close()
+"""
+
+import hashlib
+import math
+import sqlite3
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)  # бит
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # две независимые половины одного хэша дают k позиций: h1 + i * h2 (Kirsch–Mitzenmacher)
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class ScalableBloomFilter:
+    def __init__(self, capacity=10_000, error_rate=0.001, growth=2, tightening=0.5):
+        self.growth = growth
+        self.tightening = tightening  # суммарная ошибка всех фильтров не превышает error_rate / (1 - tightening)
+        self.filters = [BloomFilter(capacity, error_rate * (1 - tightening))]
+
+    def add(self, key):
+        last = self.filters[-1]
+        if last.count >= last.capacity:
+            last = BloomFilter(last.capacity * self.growth, last.error_rate * self.tightening)
+            self.filters.append(last)
+        last.add(key)
+
+    def __contains__(self, key):
+        return any(key in bloom for bloom in self.filters)
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    @property
+    def nbytes(self):
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+
+class CrawlState:
+    def __init__(self, path='.crawl_state.sqlite', commit_every=100):
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS frontier (id INTEGER PRIMARY KEY, queue TEXT, item TEXT);
+            CREATE INDEX IF NOT EXISTS frontier_item ON frontier (queue, item);
+        ''')
+        self.commit_every = commit_every
+        self.writes = 0
+        self.exact_checks = 0  # сколько раз пришлось идти в SQLite
+
+        self.bloom = ScalableBloomFilter()
+        for (key,) in self.db.execute('SELECT key FROM seen'):  # построчно, без списка в памяти
+            self.bloom.add(key)
+
+    def seen(self, key):
+        if key not in self.bloom:  # «нет» у фильтра всегда точное
+            return False
+        self.exact_checks += 1
+        return self.db.execute('SELECT 1 FROM seen WHERE key = ?', (key,)).fetchone() is not None
+
+    def add(self, queue, item):
+        # True – элемент новый: отмечен и поставлен в очередь в одной транзакции
+        key = f'{queue}:{item}'
+        if self.seen(key):
+            return False
+        self.bloom.add(key)
+        self.db.execute('INSERT OR IGNORE INTO seen (key) VALUES (?)', (key,))
+        self.db.execute('INSERT INTO frontier (queue, item) VALUES (?, ?)', (queue, item))
+        self._written()
+        return True
+
+    def done(self, queue, item):
+        self.db.execute('DELETE FROM frontier WHERE queue = ? AND item = ?', (queue, item))
+        self._written()
+
+    def pending(self, queue):
+        return [item for (item,) in self.db.execute('SELECT item FROM frontier WHERE queue = ? ORDER BY id', (queue,))]
+
+    def _written(self):
+        # коммит пачкой: после падения теряется не больше commit_every последних операций,
+        # и это всегда их конец – состояние остается согласованным, просто часть работы повторится
+        self.writes += 1
+        if self.writes % self.commit_every == 0:
+            self.db.commit()
+
+    def stats(self):
+        return {
+            'seen': len(self.bloom), 'bloom_bytes': self.bloom.nbytes, 'exact_checks': self.exact_checks,
+            'pending': dict(self.db.execute('SELECT queue, COUNT(*) FROM frontier GROUP BY queue').fetchall()),
+        }
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
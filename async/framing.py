@@ -0,0 +1,66 @@
+"""
+Разбор запросов 'Hello world!' из сокета (используется в 01_select.py, 02_selectors.py, 03_1_async_gens.py,
+06_1_protocol_server.py)
+
+- запросы разделены '\n': за одно чтение может прийти несколько запросов или часть запроса
+- recv_into пишет в буфер из пула – память не выделяется на каждое чтение
+- ответы на все запросы из одного чтения склеиваются и уходят одним send
+"""
+
+BUFFER_SIZE = 4 * 1024  # он же максимальная длина одного запроса
+POOL_SIZE = 1024
+buffer_pool = []  # свободные буферы для recv_into, чтобы не выделять память на каждое чтение
+
+
+def get_buffer():
+    return buffer_pool.pop() if buffer_pool else bytearray(BUFFER_SIZE)
+
+
+def release_buffer(buffer):
+    if len(buffer_pool) < POOL_SIZE:
+        buffer_pool.append(buffer)
+
+
+def handle_request(request):  # request – memoryview одной строки без '\n'
+    return 'Hello world!\n'.encode()
+
+
+def parse_requests(buffer, end):
+    responses = []
+    start = 0
+
+    with memoryview(buffer) as view:
+        while (pos := buffer.find(b'\n', start, end)) != -1:
+            responses.append(handle_request(view[start:pos]))  # срез memoryview – без копирования
+            start = pos + 1
+
+        rest = end - start
+        view[:rest] = view[start:end]  # недочитанный запрос переносим в начало буфера
+
+    return b''.join(responses), rest  # ответы на все запросы – одним send
+
+
+def read_requests(client_socket, incoming):
+    # incoming – {client_socket: (bytearray, int)}  # буфер с недочитанным запросом и его длина
+    buffer, filled = incoming.pop(client_socket, (None, 0))
+    if buffer is None:
+        buffer = get_buffer()
+
+    try:
+        with memoryview(buffer) as view:
+            n = client_socket.recv_into(view[filled:])  # пишет прямо в буфер, без нового bytes
+    except ConnectionError:
+        n = 0
+
+    if n:
+        response, filled = parse_requests(buffer, filled + n)
+
+    if not n or filled == len(buffer):  # клиент отключился или запрос не поместился в буфер
+        release_buffer(buffer)
+        return None
+
+    if filled:
+        incoming[client_socket] = buffer, filled
+    else:
+        release_buffer(buffer)  # между запросами соединение не держит буфер
+    return response
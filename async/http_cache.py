@@ -0,0 +1,202 @@
+"""
+Кэш HTTP-ответов на диске для aiohttp (используется в 08_async.py и 14_queue_practical.py)
+
+- тела хранятся по sha256 содержимого: одинаковые картинки с разных url лежат на диске один раз
+- индекс url → hash, ETag, Last-Modified в SQLite
+- повторный запрос идет с If-None-Match / If-Modified-Since, на 304 тело берется с диска
+- редиректы обрабатываются вручную: url-рандомайзер не кэшируется, а конечный адрес – да
+- при превышении max_bytes удаляются давно не использованные тела (LRU)
+- индекс пишется пакетами: commit раз в COMMIT_INTERVAL секунд, а не на каждый запрос
+
+cache = HTTPCache('.http_cache')
+response = await cache.fetch(session, url)
+html = await response.text()
+await response.save('pictures/1.png')  # жесткая ссылка на тело из кэша, без копирования
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import aiohttp
+from yarl import URL
+
+from stream_writer import StreamWriter
+
+COMMIT_INTERVAL = 1.0  # при сбое теряются только последние записи индекса – тела скачаются заново
+REDIRECTS = {301, 302, 303, 307, 308}
+
+
+class CachedResponse:
+    def __init__(self, url: URL, status, path=None, size=0, from_cache=False):
+        self.url = url
+        self.status = status
+        self.path = path  # файл с телом в кэше
+        self.size = size
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return self.status < 400
+
+    async def read(self):
+        return await asyncio.to_thread(self.path.read_bytes)
+
+    async def text(self, encoding='utf-8'):
+        return (await self.read()).decode(encoding, errors='replace')
+
+    async def save(self, dest):
+        await asyncio.to_thread(_link_or_copy, self.path, Path(dest))
+
+
+def _link_or_copy(src: Path, dest: Path):
+    # через временное имя: два одновременных save в один dest не мешают друг другу
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f'.{dest.name}.{uuid4().hex}.tmp')
+    try:
+        os.link(src, tmp)  # тот же inode – файл не пишется второй раз
+    except OSError:  # другая файловая система или нет поддержки ссылок
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+    tmp.unlink(missing_ok=True)  # dest уже был ссылкой на тот же inode – rename ничего не делает
+
+
+def _max_age(cache_control):
+    if cache_control is None or 'no-cache' in cache_control or 'no-store' in cache_control:
+        return 0
+    match = re.search(r'max-age=(\d+)', cache_control)
+    return int(match.group(1)) if match else 0
+
+
+class HTTPCache:
+    def __init__(self, root='.http_cache', max_bytes=512 * 1024 * 1024):
+        self.root = Path(root)
+        self.objects = self.root / 'objects'
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = self.revalidated = self.misses = 0
+
+        self.db = sqlite3.connect(self.root / 'index.sqlite')
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')  # в WAL – без fsync на каждый commit
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY, hash TEXT, etag TEXT, last_modified TEXT, expires REAL
+            );
+            CREATE TABLE IF NOT EXISTS objects (hash TEXT PRIMARY KEY, size INTEGER, used REAL);
+            CREATE INDEX IF NOT EXISTS objects_used ON objects (used);
+        ''')
+        # суммарный размер тел – в памяти, а не SUM(size) по всей таблице на каждый промах
+        self.total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM objects').fetchone()[0]
+        self._committed = time.monotonic()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def _maybe_commit(self):
+        # незакоммиченные изменения этому же соединению видны сразу, commit нужен только для диска
+        if time.monotonic() - self._committed >= COMMIT_INTERVAL:
+            self.db.commit()
+            self._committed = time.monotonic()
+
+    def _path(self, digest):
+        return self.objects / digest[:2] / digest
+
+    async def fetch(self, session: aiohttp.ClientSession, url, max_redirects=10):
+        url = URL(str(url))
+
+        for _ in range(max_redirects + 1):
+            entry = self.db.execute(
+                'SELECT hash, etag, last_modified, expires FROM urls WHERE url = ?', (str(url),)
+            ).fetchone()
+            headers = {}
+
+            if entry is not None and self._path(entry[0]).exists():
+                digest, etag, last_modified, expires = entry
+                if expires > time.time():  # Cache-Control: max-age еще не истек – без запроса
+                    self.hits += 1
+                    return self._hit(url, digest)
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
+
+            async with session.get(url, headers=headers, allow_redirects=False) as response:
+                if response.status in REDIRECTS and 'Location' in response.headers:
+                    url = response.url.join(URL(response.headers['Location']))
+                    continue
+
+                if response.status == 304 and headers:
+                    self.revalidated += 1
+                    self._update(url, entry[0], response.headers)
+                    return self._hit(url, entry[0])
+
+                if not response.ok:
+                    return CachedResponse(response.url, response.status)
+
+                digest, size = await self._store(response)
+                self.misses += 1
+                inserted = self.db.execute(
+                    'INSERT OR IGNORE INTO objects (hash, size, used) VALUES (?, ?, ?)', (digest, size, time.time())
+                ).rowcount
+                if inserted:
+                    self.total += size
+                else:  # то же тело уже пришло с другого url
+                    self.db.execute('UPDATE objects SET used = ? WHERE hash = ?', (time.time(), digest))
+                self._update(url, digest, response.headers)
+                self._evict(keep=digest)
+                return CachedResponse(url, response.status, self._path(digest), size)
+
+        raise aiohttp.TooManyRedirects(response.request_info, response.history)
+
+    def _hit(self, url, digest):
+        self.db.execute('UPDATE objects SET used = ? WHERE hash = ?', (time.time(), digest))  # commit – позже
+        path = self._path(digest)
+        return CachedResponse(url, 200, path, path.stat().st_size, from_cache=True)
+
+    def _update(self, url, digest, headers):
+        self.db.execute(
+            'INSERT OR REPLACE INTO urls (url, hash, etag, last_modified, expires) VALUES (?, ?, ?, ?, ?)',
+            (str(url), digest, headers.get('ETag'), headers.get('Last-Modified'),
+             time.time() + _max_age(headers.get('Cache-Control')))
+        )
+        self._maybe_commit()
+
+    async def _store(self, response: aiohttp.ClientResponse):
+        # StreamWriter пишет во временный файл блоками по 256 KB, хэш считается на лету,
+        # в конце – атомарное переименование в hash; такое тело уже есть – второй раз не храним
+        sha = hashlib.sha256()
+        async with StreamWriter(self.objects / 'body', size=response.content_length, overwrite=False) as file:
+            async for chunk in response.content.iter_any():
+                sha.update(chunk)
+                await file.write(chunk)
+            digest = sha.hexdigest()
+            file.path = self._path(digest)  # имя известно только после чтения всего тела
+        return digest, file.written
+
+    def _evict(self, keep):
+        if self.total <= self.max_bytes:
+            return
+
+        rows = self.db.execute('SELECT hash, size FROM objects WHERE hash != ? ORDER BY used', (keep,))
+        for digest, size in rows.fetchall():
+            self._path(digest).unlink(missing_ok=True)
+            self.db.execute('DELETE FROM objects WHERE hash = ?', (digest,))
+            self.db.execute('DELETE FROM urls WHERE hash = ?', (digest,))
+            self.total -= size
+            if self.total <= self.max_bytes:
+                break
+
+    def stats(self):
+        count = self.db.execute('SELECT COUNT(*) FROM objects').fetchone()[0]
+        return {
+            'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses,
+            'objects': count, 'bytes': self.total,
+        }
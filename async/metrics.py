@@ -0,0 +1,204 @@
+"""
+Метрики стадий конвейера (используется в 14_queue_practical.py)
+
+- на стадию: обработано, ошибки, элементов в секунду, байты и гистограмма задержек
+- глубина очередей: замеряется каждые sample_interval секунд, в логе – текущая, максимум и среднее за период
+- раз в log_interval секунд – строка JSON в stdout
+- http://localhost:9100/metrics – то же в текстовом формате Prometheus
+
+Гистограмма в стиле HDR: логарифмические диапазоны (степени двойки), внутри каждого – 2**precision
+равных корзин. Ошибка значения не больше 1 / 2**precision (~3 % при precision=5), память – сотни счетчиков
+на любой диапазон от микросекунд до часов, запись – O(1).
+
+metrics = Metrics()
+metrics.watch('pages_queue', pages_queue)
+with metrics.stage('download').time():
+    ...
+metrics.stage('download').bytes += size
+await metrics.start()
+"""
+
+import asyncio
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from time import monotonic, perf_counter, time
+
+from aiohttp import web
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class Histogram:
+    def __init__(self, precision=5, unit=1e-6):
+        self.precision = precision
+        self.sub_buckets = 1 << precision
+        self.unit = unit  # значения хранятся целыми в микросекундах
+        self.counts = defaultdict(int)  # {номер корзины: количество} – пустые корзины не хранятся
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _index(self, value):
+        if value < self.sub_buckets:
+            return value
+        shift = value.bit_length() - self.precision - 1
+        return (shift + 1) * self.sub_buckets + (value >> shift) - self.sub_buckets
+
+    def _value(self, index):  # нижняя граница корзины = верхняя граница предыдущей
+        if index < self.sub_buckets:
+            return index
+        shift, top = divmod(index, self.sub_buckets)
+        return (top + self.sub_buckets) << (shift - 1)
+
+    def record(self, seconds):
+        self.counts[self._index(int(seconds / self.unit))] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def record_corrected(self, seconds, expected_interval):
+        # поправка на coordinated omission (как recordValueWithExpectedInterval в HdrHistogram):
+        # пока запрос висел, замкнутый клиент не отправил следующие – дописываем задержки, которые они бы получили
+        self.record(seconds)
+        if expected_interval <= 0:
+            return
+        missing = seconds - expected_interval
+        while missing >= expected_interval:
+            self.record(missing)
+            missing -= expected_interval
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:  # как в HDR: верхняя граница корзины, оценка не занижает задержку
+                return min(self._value(index + 1) * self.unit, self.max)
+        return self.max
+
+    def summary(self):
+        return {f'p{q * 100:g}': round(self.quantile(q), 6) for q in QUANTILES} | {'max': round(self.max, 6)}
+
+
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latency = Histogram()
+        self._last_items = 0
+
+    @contextmanager
+    def time(self):
+        t0 = perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.errors += 1
+            raise
+        else:
+            self.items += 1
+        finally:
+            self.latency.record(perf_counter() - t0)
+
+
+class Metrics:
+    def __init__(self, log_interval=5.0, sample_interval=0.1, port=9100):
+        self.log_interval = log_interval
+        self.sample_interval = sample_interval
+        self.port = port
+        self.stages = {}
+        self.queues = {}  # {name: queue}
+        self.depths = {}  # {name: [сумма, число замеров, максимум]} за текущий период лога
+        self._tasks = []
+        self._runner = None
+        self._last_log = monotonic()
+
+    def stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = Stage(name)
+        return self.stages[name]
+
+    def watch(self, name, queue: asyncio.Queue):
+        self.queues[name] = queue
+        self.depths[name] = [0, 0, 0]
+
+    async def start(self):
+        self._last_log = monotonic()
+        self._tasks = [asyncio.create_task(self._sample()), asyncio.create_task(self._log())]
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, 'localhost', self.port).start()
+        return self
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        print(json.dumps(self.snapshot()))  # итог
+        await self._runner.cleanup()
+
+    async def _sample(self):
+        while True:
+            for name, queue in self.queues.items():
+                depth = queue.qsize()
+                stats = self.depths[name]
+                stats[0] += depth
+                stats[1] += 1
+                stats[2] = max(stats[2], depth)
+            await asyncio.sleep(self.sample_interval)
+
+    async def _log(self):
+        while True:
+            await asyncio.sleep(self.log_interval)
+            print(json.dumps(self.snapshot()))
+
+    def snapshot(self):
+        # per_sec и глубины очередей – за время с прошлого снимка
+        now = monotonic()
+        elapsed, self._last_log = now - self._last_log, now
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = {
+                'items': stage.items, 'errors': stage.errors, 'bytes': stage.bytes,
+                'per_sec': round((stage.items - stage._last_items) / elapsed, 2),
+                'latency': stage.latency.summary(),
+            }
+            stage._last_items = stage.items
+
+        queues = {}
+        for name, queue in self.queues.items():
+            total, samples, peak = self.depths[name]
+            queues[name] = {'depth': queue.qsize(), 'max': peak, 'mean': round(total / samples, 2) if samples else 0}
+            self.depths[name] = [0, 0, 0]
+
+        return {'ts': round(time(), 3), 'stages': stages, 'queues': queues}
+
+    def prometheus(self):
+        # строки одной метрики идут подряд после своего # TYPE
+        lines = []
+        for metric, attr in ('stage_items_total', 'items'), ('stage_errors_total', 'errors'), ('stage_bytes_total', 'bytes'):
+            lines.append(f'# TYPE {metric} counter')
+            lines += [f'{metric}{{stage="{name}"}} {getattr(stage, attr)}' for name, stage in self.stages.items()]
+
+        lines.append('# TYPE stage_latency_seconds summary')
+        for name, stage in self.stages.items():
+            lines += [
+                f'stage_latency_seconds{{stage="{name}",quantile="{q}"}} {stage.latency.quantile(q):.6f}'
+                for q in QUANTILES
+            ]
+            lines.append(f'stage_latency_seconds_sum{{stage="{name}"}} {stage.latency.total:.6f}')
+            lines.append(f'stage_latency_seconds_count{{stage="{name}"}} {stage.latency.count}')
+
+        lines.append('# TYPE queue_depth gauge')
+        lines += [f'queue_depth{{queue="{name}"}} {queue.qsize()}' for name, queue in self.queues.items()]
+        return '\n'.join(lines) + '\n'
+
+    async def _handle(self, request: web.Request):
+        return web.Response(text=self.prometheus(), content_type='text/plain', charset='utf-8')
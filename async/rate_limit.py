@@ -0,0 +1,147 @@
+"""
+Ограничение частоты вызовов без задачи на каждый вызов (используется в 15_1_client.py)
+
+Semaphore + create_task(sleep) на каждый вызов держит тысячи спящих задач при тысячах вызовов в секунду.
+Здесь у ограничителя одна очередь ожидающих future и не больше одного таймера loop.call_at:
+он срабатывает ровно тогда, когда первый в очереди может пройти, время – арифметика над loop.time().
+
+TokenBucket(rate, burst) – в среднем rate вызовов в секунду, подряд без ожидания – до burst
+SlidingWindow(limit, period) – не больше limit вызовов за любые period секунд (журнал времен вызовов)
+Keyed(lambda: TokenBucket(10, 20)) – отдельный ограничитель на каждый ключ, например хост
+
+bucket = TokenBucket(rate=100, burst=20)
+await bucket.acquire()
+
+@rate_limited(Keyed(lambda: TokenBucket(5, 5)), key=lambda url, session: URL(url).host)
+async def make_request(url, session):
+    ...
+"""
+
+import asyncio
+from collections import deque
+from functools import wraps
+
+
+class _Limiter:
+    # ожидающие обслуживаются по очереди (FIFO): поздний вызов не обгонит ранний
+    # подкласс задает _try(now) – занять место, если можно прямо сейчас,
+    # и _ready_at(now) – когда можно будет занять место
+    def __init__(self):
+        self.waiters = deque()  # future
+        self.timer = None
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        if not self.waiters and self._try(loop.time()):
+            return
+
+        waiter = loop.create_future()
+        self.waiters.append(waiter)
+        self._schedule(loop)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            raise
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def _schedule(self, loop):
+        if self.timer is None and self.waiters:
+            self.timer = loop.call_at(self._ready_at(loop.time()), self._wakeup, loop)
+
+    def _wakeup(self, loop):
+        self.timer = None
+        now = loop.time()
+        while self.waiters:
+            if self.waiters[0].done():  # отменен
+                self.waiters.popleft()
+            elif self._try(now):
+                self.waiters.popleft().set_result(None)
+            else:
+                break
+        self._schedule(loop)
+
+
+class TokenBucket(_Limiter):
+    def __init__(self, rate, burst=1):
+        super().__init__()
+        self.rate = rate  # токенов в секунду
+        self.burst = burst  # емкость ведра
+        self.tokens = burst
+        self.updated = None
+
+    def _refill(self, now):
+        if self.updated is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _try(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def _ready_at(self, now):
+        self._refill(now)
+        return now + max(0.0, (1 - self.tokens) / self.rate)
+
+
+class SlidingWindow(_Limiter):
+    def __init__(self, limit, period=1.0):
+        super().__init__()
+        self.limit = limit
+        self.period = period
+        self.log = deque()  # время пропущенных вызовов за последние period секунд
+
+    def _prune(self, now):
+        while self.log and self.log[0] <= now - self.period:
+            self.log.popleft()
+
+    def _try(self, now):
+        self._prune(now)
+        if len(self.log) < self.limit:
+            self.log.append(now)
+            return True
+        return False
+
+    def _ready_at(self, now):
+        self._prune(now)
+        return self.log[0] + self.period if len(self.log) >= self.limit else now
+
+
+class Keyed:
+    def __init__(self, factory):
+        self.factory = factory
+        self.limiters = {}
+
+    def __getitem__(self, key):
+        limiter = self.limiters.get(key)
+        if limiter is None:
+            limiter = self.limiters[key] = self.factory()
+        return limiter
+
+    async def acquire(self, key):
+        await self[key].acquire()
+
+
+def rate_limited(limiter, key=None):
+    # key(*args, **kwargs) -> ключ для Keyed; без key – один общий ограничитель
+    def wrapper(coro):
+        @wraps(coro)
+        async def inner_coro(*args, **kwargs):
+            if key is None:
+                await limiter.acquire()
+            else:
+                await limiter.acquire(key(*args, **kwargs))
+            return await coro(*args, **kwargs)
+
+        return inner_coro
+
+    return wrapper
@@ -0,0 +1,113 @@
+"""
+Кэш готовых HTTP-ответов для FastAPI (используется в 15_0_server.py)
+
+@cache_response() помечает эндпоинт, ResponseCacheMiddleware отдает для него сохраненные байты:
+первый запрос проходит обычный путь (зависимости, валидация response_model, сериализация),
+ответ 200 запоминается целиком – статус, заголовки, тело. Повторные запросы к тому же пути и query
+отдаются из памяти, не доходя до маршрутизации, валидации и JSON-кодировщика.
+ttl=None – навсегда (статические ответы), иначе – секунды.
+
+FastJSONResponse – JSONResponse на orjson, если он установлен.
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(ResponseCacheMiddleware)
+
+@app.get('/hello')
+@cache_response(ttl=60)
+async def greet():
+    ...
+"""
+
+from collections import OrderedDict
+from time import monotonic
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+try:
+    import orjson
+except ImportError:  # без orjson – обычный json из стандартной библиотеки
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def cache_response(ttl=None):
+    def decorator(endpoint):
+        endpoint.cache_ttl = ttl  # функцию не оборачиваем: FastAPI видит ее сигнатуру как есть
+        return endpoint
+
+    return decorator
+
+
+class ResponseCacheMiddleware:
+    # чистый ASGI, а не BaseHTTPMiddleware: тот на каждый запрос создает задачу и поток тела
+    def __init__(self, app, maxsize=1024):
+        self.app = app
+        self.maxsize = maxsize
+        self.cache = OrderedDict()  # {(path, query): (expires, status, headers, body)}
+        self.routes = None  # [(path_regex, ttl)] – собираются при первом запросе, когда все маршруты добавлены
+        self.hits = self.misses = 0
+
+    def _ttl(self, scope):
+        if self.routes is None:
+            self.routes = [
+                (route.path_regex, route.endpoint.cache_ttl)
+                for route in scope['app'].routes
+                if isinstance(route, APIRoute) and hasattr(route.endpoint, 'cache_ttl')
+                and 'GET' in route.methods
+            ]
+        for regex, ttl in self.routes:
+            if regex.match(scope['path']):
+                return True, ttl
+        return False, None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'GET':
+            return await self.app(scope, receive, send)
+
+        key = scope['path'], scope['query_string']
+        entry = self.cache.get(key)
+        if entry is not None:
+            expires, status, headers, body = entry
+            if expires is None or expires > monotonic():
+                self.hits += 1
+                self.cache.move_to_end(key)
+                await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+                await send({'type': 'http.response.body', 'body': body})
+                return
+            del self.cache[key]
+
+        cacheable, ttl = self._ttl(scope)
+        if not cacheable:
+            return await self.app(scope, receive, send)
+
+        self.misses += 1
+        start, chunks = None, []
+
+        async def capture(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                start = message
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+                if not message.get('more_body', False):
+                    self._store(key, ttl, start, b''.join(chunks))
+            await send(message)
+
+        await self.app(scope, receive, capture)
+
+    def _store(self, key, ttl, start, body):
+        headers = list(start.get('headers', []))
+        if start['status'] != 200 or any(name.lower() == b'set-cookie' for name, _ in headers):
+            return  # ошибки и персональные ответы не кэшируем
+        expires = None if ttl is None else monotonic() + ttl
+        self.cache[key] = expires, start['status'], headers, body
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
@@ -0,0 +1,130 @@
+"""
+Счетчик, общий для нескольких процессов-воркеров (используется в 15_0_server.py)
+
+Один блок multiprocessing.shared_memory – массив int64:
+    [база из снимка, pid_0, count_0, pid_1, count_1, ...]
+Каждый воркер при старте занимает свою ячейку (shard) и увеличивает только ее: писатель у ячейки один,
+а внутри воркера код выполняется в одном потоке событийного цикла – замок не нужен ни между процессами,
+ни внутри процесса. Чтение складывает все ячейки.
+
+Замок (fcntl.flock на файл) берется только при занятии и освобождении ячейки.
+Ячейка умершего воркера достается новому вместе с накопленным значением – счет не теряется.
+Воркер с ячейкой 0 раз в snapshot_interval секунд сохраняет итог в JSON; последний уходящий воркер
+сохраняет итог и удаляет блок, а следующий запуск начинает со значения из снимка.
+
+counter = ShardedCounter('requests')
+counter.increment()
+counter.value
+counter.close()
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from tempfile import gettempdir
+
+SLOT = 8  # байт на int64
+
+
+@contextmanager
+def _flock(path):
+    with open(path, 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # процесс есть, но чужой
+        return True
+    return True
+
+
+class ShardedCounter:
+    def __init__(self, name='counter', shards=64, snapshot=None, snapshot_interval=5.0):
+        self.name = name
+        self.shards = shards
+        self.snapshot = Path(snapshot or f'.{name}_count.json')
+        self.snapshot_interval = snapshot_interval
+        self.lock_path = Path(gettempdir()) / f'{name}_counter.lock'
+        self._task = None
+
+        with _flock(self.lock_path):
+            try:
+                self.shm = shared_memory.SharedMemory(f'{name}_counter', create=True, size=SLOT * (1 + 2 * shards))
+                created = True
+            except FileExistsError:
+                self.shm = shared_memory.SharedMemory(f'{name}_counter')
+                created = False
+            # временем жизни блока управляем сами: иначе resource_tracker удалит его,
+            # когда завершится первый же воркер
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+
+            self.cells = self.shm.buf.cast('q')
+            if created:
+                self.cells[0] = self._load()
+            self.shard = self._claim()
+
+    def _load(self):
+        try:
+            return json.loads(self.snapshot.read_text())['value']
+        except (FileNotFoundError, ValueError, KeyError):
+            return 0
+
+    def _claim(self):
+        pid = os.getpid()
+        for shard in range(self.shards):
+            owner = self.cells[1 + 2 * shard]
+            if owner == 0 or owner == pid or not _alive(owner):
+                self.cells[1 + 2 * shard] = pid
+                return shard
+        raise RuntimeError(f'all {self.shards} shards of {self.name!r} are taken')
+
+    def increment(self, n=1):
+        self.cells[2 + 2 * self.shard] += n  # только этот процесс пишет в свою ячейку
+
+    @property
+    def value(self):
+        return self.cells[0] + sum(self.cells[2::2])
+
+    def save(self):
+        tmp = self.snapshot.with_name(f'{self.snapshot.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps({'value': self.value}))
+        os.replace(tmp, self.snapshot)  # читатель видит либо старый, либо новый снимок целиком
+
+    async def _save_periodically(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await asyncio.to_thread(self.save)
+
+    def start(self):
+        if self.shard == 0:
+            self._task = asyncio.create_task(self._save_periodically())
+        return self
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+
+        with _flock(self.lock_path):
+            self.cells[1 + 2 * self.shard] = 0  # значение ячейки остается – его продолжит следующий воркер
+            last = not any(
+                self.cells[1 + 2 * shard] and _alive(self.cells[1 + 2 * shard]) for shard in range(self.shards)
+            )
+            if last:
+                self.save()
+            self.cells.release()
+            self.shm.close()
+            if last:
+                resource_tracker.register(self.shm._name, 'shared_memory')  # unlink снимает регистрацию сам
+                self.shm.unlink()
@@ -0,0 +1,91 @@
+"""
+Запись потока из сети на диск крупными блоками (используется в 14_queue_practical.py и http_cache.py)
+
+aiofiles на каждый write делает переход в пул потоков: картинка 1 MB кусками по 1 KB – 1000 переходов.
+StreamWriter копит куски в буфере buffer_size (256 KB) и пишет его одним вызовом:
+- при известном Content-Length место под файл выделяется заранее (posix_fallocate) – меньше фрагментации;
+- запись идет во временный файл рядом с целевым, os.replace в конце – читатели не видят недописанный файл,
+  а при ошибке временный файл удаляется;
+- свой небольшой пул потоков: запись на диск не занимает пул по умолчанию (DNS, to_thread и т. д.).
+
+async with StreamWriter(path, size=response.content_length) as file:
+    async for chunk in response.content.iter_any():
+        await file.write(chunk)
+
+Если имя известно только после записи (например, хэш содержимого), file.path можно поменять внутри блока;
+overwrite=False – уже существующий файл не заменяется, временный просто удаляется.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from uuid import uuid4
+
+BUFFER_SIZE = 256 * 1024
+
+writer_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='writer')
+
+
+def _open(tmp: Path, size):
+    tmp.parent.mkdir(parents=True, exist_ok=True)
+    file = open(tmp, 'wb')  # блоки крупнее буфера BufferedWriter уходят в write напрямую
+    if size and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(file.fileno(), 0, size)
+        except OSError:  # файловая система не поддерживает – не страшно
+            pass
+    return file
+
+
+def _finish(file, data, tmp: Path, path: Path, overwrite=True):
+    # последний блок, обрезка лишнего (Content-Length соврал), закрытие и переименование – за один переход в поток
+    try:
+        if data:
+            file.write(data)
+        file.truncate(file.tell())
+    finally:
+        file.close()
+    if not overwrite and path.exists():
+        tmp.unlink()
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp, path)
+
+
+def _abort(file, tmp: Path):
+    file.close()
+    tmp.unlink(missing_ok=True)
+
+
+class StreamWriter:
+    def __init__(self, path, size=None, buffer_size=BUFFER_SIZE, executor=writer_pool, overwrite=True):
+        self.path = Path(path)
+        self.tmp = self.path.with_name(f'.{self.path.name}.{uuid4().hex}.tmp')  # в той же папке – rename атомарен
+        self.size = size
+        self.overwrite = overwrite
+        self.buffer_size = buffer_size
+        self.executor = executor
+        self.buffer = bytearray()
+        self.file = None
+        self.written = 0
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def __aenter__(self):
+        self.file = await self._run(_open, self.tmp, self.size)
+        return self
+
+    async def write(self, chunk):
+        self.buffer += chunk
+        self.written += len(chunk)
+        if len(self.buffer) >= self.buffer_size:
+            data, self.buffer = self.buffer, bytearray()  # новый буфер: старый пишется в потоке
+            await self._run(self.file.write, data)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self._run(_finish, self.file, self.buffer, self.tmp, Path(self.path), self.overwrite)
+        else:
+            await self._run(_abort, self.file, self.tmp)